@@ -1,12 +1,41 @@
-import sanic
 import asyncio
+import cProfile
+import io
 import json
+import pstats
+import secrets
+import signal
+import time
+from collections import deque
+
+import sanic
 from sanic.log import logger
-from prometheus_client import Counter, CollectorRegistry, generate_latest
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest
 from prometheus_client import CONTENT_TYPE_LATEST
 from sanic import Request, Websocket
 
-from cave import Cave, WikipediaThinker, LOCThinker, OpenLibraryThinker
+from cache import cache_requests_counter, cache_entries_gauge
+from extraction import (
+    extraction_memo_counter, extraction_memo_entries_gauge, extraction_memo_hit_ratio_gauge
+)
+from broadcast import DROP_OLDEST
+from frames import BINARY, ENCODINGS, JSON, SSE, thinker_ids
+from bus import ThoughtBus, ThoughtBusClient
+from metrics import MetricsServer, ThoughtWords, fetch_metrics
+from nlp import get_nlp, nlp_batch_size_histogram
+from pacing import Pacer
+from rooms import Rooms, audience_gauge, rooms_gauge
+from upstream import circuit_state_gauge, upstream_rejections_counter
+from thinker import thinker_stage_histogram, thinker_fallbacks_counter
+from cave import Cave, DEFAULT_ROOM, INDEPENDENT
+from cave import think_histogram, race_histogram, commits_counter
+from cave import thinker_loops_gauge, thinker_restarts_counter
+from store import ThoughtStore
+from transport import LIVE, RECORD, REPLAY, Recorder, RecordingTransport, ReplayTransport, read_header
+from thinkers.thinker_wikipedia import WikipediaThinker
+from thinkers.thinker_loc import LOCThinker
+from thinkers.thinker_openlibrary import OpenLibraryThinker
+from wsprotocol import DeflateWebSocketProtocol
 
 
 app = sanic.Sanic("ContemplateWhirlpool")
@@ -14,19 +43,380 @@ app = sanic.Sanic("ContemplateWhirlpool")
 # Enable CORS
 app.config.CORS_ORIGINS = "*"
 
-word_occurrence_counter = Counter(
-    'thought_words_total',
-    'Total occurrences of each thought word',
-    ['word', 'thinker']
+# Path of the persistent thought store, e.g. SANIC_THOUGHT_STORE=/data/thoughts.db
+app.config.THOUGHT_STORE = app.config.get("THOUGHT_STORE", "")
+# How many stored thoughts are kept in memory; the rest are read from disk
+app.config.THOUGHT_STORE_SIZE = app.config.get("THOUGHT_STORE_SIZE", 50_000)
+
+# Exposes /admin/profile when set, e.g. SANIC_PROFILER=true
+app.config.PROFILER = app.config.get("PROFILER", False)
+app.config.PROFILER_MAX_SECONDS = app.config.get("PROFILER_MAX_SECONDS", 60)
+
+# Upstream origins; empty means the thinker's live default
+app.config.WIKIPEDIA_URL = app.config.get("WIKIPEDIA_URL", "")
+app.config.LOC_URL = app.config.get("LOC_URL", "")
+app.config.OPENLIBRARY_URL = app.config.get("OPENLIBRARY_URL", "")
+app.config.PORT = app.config.get("PORT", 1234)
+
+# live calls the upstreams; record also appends every exchange to
+# TRANSPORT_CORPUS; replay serves that corpus with no network, its recorded
+# latencies divided by REPLAY_SPEED (0 for no delay)
+app.config.TRANSPORT = app.config.get("TRANSPORT", LIVE)
+app.config.TRANSPORT_CORPUS = app.config.get("TRANSPORT_CORPUS", "")
+app.config.REPLAY_SPEED = app.config.get("REPLAY_SPEED", 1.0)
+# Seeds the thinkers' choices among candidates and their pacing jitter. A
+# recording saves the seed it used (a fresh one if unset) and a replay
+# reuses it, so the replayed chain asks for what was recorded.
+app.config.THINKER_SEED = app.config.get("THINKER_SEED", "")
+
+# With more than one worker, a separate producer process runs the cave and
+# the workers follow its thoughts over a Unix socket (the thought bus)
+app.config.WORKERS = app.config.get("WORKERS", 1)
+app.config.THOUGHT_BUS = app.config.get("THOUGHT_BUS", "/tmp/contemplate-whirlpool.sock")
+# The producer's metrics are served on this Unix socket for the workers to
+# include in their /prometheus
+app.config.PRODUCER_METRICS = app.config.get("PRODUCER_METRICS", "/tmp/contemplate-whirlpool-metrics.sock")
+
+# Per-client send queue: how many thoughts a slow client may fall behind, what
+# to do when it is full (drop_oldest or coalesce) and how long one send may
+# take before the client is disconnected
+app.config.WS_QUEUE_SIZE = app.config.get("WS_QUEUE_SIZE", 8)
+app.config.WS_QUEUE_POLICY = app.config.get("WS_QUEUE_POLICY", DROP_OLDEST)
+app.config.WS_SEND_TIMEOUT = app.config.get("WS_SEND_TIMEOUT", 10)
+
+# permessage-deflate for clients that offer it: zlib level, window bits
+# (9-15) and whether each connection keeps its compression context between
+# frames (better ratio on small frames, one window of memory per client)
+app.config.WS_DEFLATE = app.config.get("WS_DEFLATE", False)
+app.config.WS_DEFLATE_LEVEL = app.config.get("WS_DEFLATE_LEVEL", 6)
+app.config.WS_DEFLATE_WINDOW_BITS = app.config.get("WS_DEFLATE_WINDOW_BITS", 12)
+app.config.WS_DEFLATE_CONTEXT_TAKEOVER = app.config.get("WS_DEFLATE_CONTEXT_TAKEOVER", True)
+
+# Fallbacks for clients that cannot keep a websocket open. /sse streams the
+# same thoughts as Server-Sent Events, with a keep-alive comment every
+# SSE_KEEPALIVE seconds and SSE_RETRY ms as the browser's reconnect delay.
+# /poll?since=<seq> answers as soon as there is something newer than <seq>,
+# or with [] after POLL_TIMEOUT seconds; a poller counts towards the
+# audience until POLL_LINGER seconds after its last request.
+app.config.SSE_KEEPALIVE = app.config.get("SSE_KEEPALIVE", 15)
+app.config.SSE_RETRY = app.config.get("SSE_RETRY", 3000)
+app.config.POLL_TIMEOUT = app.config.get("POLL_TIMEOUT", 25)
+app.config.POLL_LINGER = app.config.get("POLL_LINGER", 2)
+
+# Per-worker connection caps for each transport; 0 means no cap
+app.config.MAX_WS_CLIENTS = app.config.get("MAX_WS_CLIENTS", 10000)
+app.config.MAX_SSE_CLIENTS = app.config.get("MAX_SSE_CLIENTS", 5000)
+app.config.MAX_POLL_CLIENTS = app.config.get("MAX_POLL_CLIENTS", 5000)
+
+# On shutdown (e.g. a rolling restart), how long thoughts in flight get to
+# land and clients to be handed their last frames before they are cut off
+app.config.DRAIN_TIMEOUT = app.config.get("DRAIN_TIMEOUT", 10)
+
+# How many recent thoughts are kept for /history and /ws?since=
+app.config.HISTORY_SIZE = app.config.get("HISTORY_SIZE", 100)
+
+# SANIC_CAVE_MODE=race has all thinkers work on each thought at once and
+# publishes the first real answer; HEDGE_DELAY > 0 starts only the fastest
+# thinker and the others after that many seconds without an answer
+app.config.CAVE_MODE = app.config.get("CAVE_MODE", INDEPENDENT)
+app.config.HEDGE_DELAY = app.config.get("HEDGE_DELAY", 0)
+
+# Target time between thoughts in seconds. With PAUSE_WHEN_IDLE nothing
+# thinks (or calls upstream) while no client is connected.
+app.config.THOUGHT_INTERVAL = app.config.get("THOUGHT_INTERVAL", 1.0)
+app.config.PAUSE_WHEN_IDLE = app.config.get("PAUSE_WHEN_IDLE", True)
+# Per-source caps on thinks per minute across all rooms, as JSON, over the
+# thinkers' own defaults; 0 lifts a cap:
+#   {"WikipediaThinker": 30, "LOCThinker": 0}
+app.config.THINKS_PER_MINUTE = app.config.get("THINKS_PER_MINUTE", "")
+
+# Rooms are independent chains served on /ws/<room>, created on first use
+# and seeded with their own name. SANIC_ROOMS can give a room another seed
+# and a subset of the thinkers, as JSON:
+#   {"books": {"seed": "novel", "thinkers": ["OpenLibraryThinker"]}}
+# Rooms other than the default one always pause while nobody watches them.
+app.config.ROOMS = app.config.get("ROOMS", "")
+app.config.MAX_ROOMS = app.config.get("MAX_ROOMS", 500)
+
+# Settings the producer process needs to build its caves
+CAVE_CONFIG = (
+    "THOUGHT_STORE", "THOUGHT_STORE_SIZE", "WIKIPEDIA_URL", "LOC_URL", "OPENLIBRARY_URL", "THOUGHT_BUS", "HISTORY_SIZE",
+    "PRODUCER_METRICS", "CAVE_MODE", "HEDGE_DELAY", "THOUGHT_INTERVAL", "PAUSE_WHEN_IDLE",
+    "THINKS_PER_MINUTE",
+    "TRANSPORT", "TRANSPORT_CORPUS", "REPLAY_SPEED", "THINKER_SEED", "ROOMS", "MAX_ROOMS", "DRAIN_TIMEOUT"
+)
+
+# Counted once per published thought by the cave, not once per viewer
+thought_words = ThoughtWords()
+
+websocket_clients_gauge = Gauge(
+    'websocket_clients',
+    'Currently connected websocket clients'
+)
+
+websocket_send_delay_histogram = Histogram(
+    'websocket_send_delay_seconds',
+    'Time from a thought being published to it being sent to a client',
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+)
+
+websocket_dropped_counter = Counter(
+    'websocket_dropped_thoughts',
+    'Thoughts dropped from full per-client websocket send queues'
 )
 
+websocket_evictions_counter = Counter(
+    'websocket_evictions',
+    'Websocket clients disconnected for not accepting a send in time'
+)
+
+stream_clients_gauge = Gauge(
+    'stream_clients',
+    'Currently connected Server-Sent Events and long-poll clients',
+    ['transport']
+)
+
+stream_dropped_counter = Counter(
+    'stream_dropped_thoughts',
+    'Thoughts dropped from full per-client send queues of Server-Sent Events clients',
+    ['transport']
+)
+
+stream_evictions_counter = Counter(
+    'stream_evictions',
+    'Server-Sent Events clients disconnected for not accepting a send in time',
+    ['transport']
+)
+
+connections_rejected_counter = Counter(
+    'connections_rejected',
+    'Connections turned away because their transport was at its cap',
+    ['transport']
+)
+
+websocket_sent_bytes_counter = Counter(
+    'websocket_sent_bytes',
+    'Frame bytes sent to websocket clients (characters for text frames), before compression',
+    ['encoding']
+)
+
+# What the thinking side counts. In multi-worker mode only the producer
+# process thinks, so workers fetch these from it for their /prometheus.
+cave_registry = CollectorRegistry()
+cave_registry.register(thought_words)
+cave_registry.register(cache_requests_counter)
+cave_registry.register(cache_entries_gauge)
+cave_registry.register(extraction_memo_counter)
+cave_registry.register(extraction_memo_entries_gauge)
+cave_registry.register(extraction_memo_hit_ratio_gauge)
+cave_registry.register(nlp_batch_size_histogram)
+cave_registry.register(circuit_state_gauge)
+cave_registry.register(upstream_rejections_counter)
+cave_registry.register(thinker_stage_histogram)
+cave_registry.register(thinker_fallbacks_counter)
+cave_registry.register(think_histogram)
+cave_registry.register(race_histogram)
+cave_registry.register(commits_counter)
+cave_registry.register(thinker_loops_gauge)
+cave_registry.register(thinker_restarts_counter)
+
+# What each worker counts about its own clients
+registry = CollectorRegistry()
+registry.register(audience_gauge)
+registry.register(rooms_gauge)
+registry.register(websocket_clients_gauge)
+registry.register(websocket_send_delay_histogram)
+registry.register(websocket_dropped_counter)
+registry.register(websocket_evictions_counter)
+registry.register(websocket_sent_bytes_counter)
+registry.register(stream_clients_gauge)
+registry.register(stream_dropped_counter)
+registry.register(stream_evictions_counter)
+registry.register(connections_rejected_counter)
+
+
+def build_rooms(config) -> Rooms:
+    store = ThoughtStore(
+        config["THOUGHT_STORE"], max_entries=int(config["THOUGHT_STORE_SIZE"])
+    ) if config["THOUGHT_STORE"] else None
+    thinkers = {
+        thinker.get_name(): thinker for thinker in (
+            WikipediaThinker("WikipediaThinker", base_url=config["WIKIPEDIA_URL"]),
+            LOCThinker("LOCThinker", base_url=config["LOC_URL"]),
+            OpenLibraryThinker("OpenLibraryThinker", base_url=config["OPENLIBRARY_URL"]),
+        )
+    }
+
+    mode, corpus = config["TRANSPORT"], config["TRANSPORT_CORPUS"]
+    if mode != LIVE and not corpus:
+        raise ValueError(f"SANIC_TRANSPORT={mode} needs SANIC_TRANSPORT_CORPUS")
+    seed = str(config["THINKER_SEED"])
+    if mode != LIVE:
+        seed = seed or read_header(corpus).get("seed", "")
+    if mode == RECORD:
+        seed = seed or secrets.token_hex(8)
+        recorder = Recorder(corpus, header={"seed": seed})
+        for thinker in thinkers.values():
+            thinker.transport = RecordingTransport(thinker.live_transport(), recorder)
+    elif mode == REPLAY:
+        replay = ReplayTransport(corpus, float(config["REPLAY_SPEED"]))
+        for thinker in thinkers.values():
+            thinker.transport = replay
+    elif mode != LIVE:
+        raise ValueError(f"Unknown transport: {mode}")
+    if seed:
+        logger.info(f"Thinker seed: {seed}")
+        for thinker in thinkers.values():
+            thinker.seed(seed)
+
+    budgets = json.loads(config["THINKS_PER_MINUTE"]) if config["THINKS_PER_MINUTE"] else {}
+    unknown = budgets.keys() - thinkers.keys()
+    if unknown:
+        raise ValueError(f"Unknown thinkers in SANIC_THINKS_PER_MINUTE: {', '.join(sorted(unknown))}")
+    for name, thinks_per_minute in budgets.items():
+        thinkers[name].thinks_per_minute = float(thinks_per_minute)
+
+    rooms = json.loads(config["ROOMS"]) if config["ROOMS"] else {}
+    for room in rooms.values():
+        unknown = set(room.get("thinkers", ())) - thinkers.keys()
+        if unknown:
+            raise ValueError(f"Unknown thinkers in SANIC_ROOMS: {', '.join(sorted(unknown))}")
+
+    def make_cave(room: str) -> Cave:
+        spec = rooms.get(room, {})
+        seed = "stake" if room == DEFAULT_ROOM else room.replace("-", " ").replace("_", " ")
+        cave = Cave(
+            store=store, words=thought_words, history_size=int(config["HISTORY_SIZE"]),
+            mode=config["CAVE_MODE"], hedge_delay=float(config["HEDGE_DELAY"]),
+            pacer=Pacer(
+                float(config["THOUGHT_INTERVAL"]),
+                idle=bool(config["PAUSE_WHEN_IDLE"]) or room != DEFAULT_ROOM
+            ),
+            room=room, seed=spec.get("seed", seed)
+        )
+        for name in spec.get("thinkers", thinkers):
+            cave.add_thinker(thinkers[name])
+        return cave
+
+    return Rooms(make_cave, list(thinkers.values()), store, int(config["MAX_ROOMS"]))
+
+
+def mirror_rooms(config) -> Rooms:
+    # Workers in multi-worker mode: caves that only replay the producer's
+    # chains, with no thinkers of their own
+    return Rooms(
+        lambda room: Cave(history_size=int(config["HISTORY_SIZE"]), room=room),
+        max_rooms=int(config["MAX_ROOMS"])
+    )
+
+
+async def warm_up(rooms: Rooms, warm: dict[str, bool]):
+    # The slow part of starting up: runs in the background so the server
+    # answers / and /prometheus straight away. ``warm`` backs /ready.
+    started = time.monotonic()
+    if rooms.store is not None:
+        await rooms.store.load()
+    warm["store"] = True
+    await asyncio.gather(*(thinker.open() for thinker in rooms.thinkers))
+    warm["thinkers"] = True
+    await get_nlp().load()
+    warm["nlp"] = True
+    logger.info(f"Caves warmed up in {time.monotonic() - started:.2f}s")
+
+
+async def think(rooms: Rooms, warm: dict[str, bool]):
+    await warm_up(rooms, warm)
+    rooms.start()
+
+
+def produce(config: dict):
+    # Producer process for multi-worker mode: the one set of caves that thinks
+    async def main():
+        rooms = build_rooms(config)
+        bus = ThoughtBus(config["THOUGHT_BUS"], on_audience=lambda room, audience: (
+            (cave := rooms.get(room, create=audience > 0)) and cave.set_audience(audience)
+        ))
+        rooms.on_cave.append(lambda cave: cave.listeners.append(
+            lambda message, room=cave.room: bus.publish(message, room)
+        ))
+        rooms.get(DEFAULT_ROOM)
+        # The worker manager stops us with a signal: let thoughts in flight
+        # land and reach the workers before closing
+        stopped = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(signum, stopped.set)
+        await bus.start()
+        metrics = MetricsServer(config["PRODUCER_METRICS"], cave_registry)
+        await metrics.start()
+        try:
+            await think(rooms, {})
+            await stopped.wait()
+        finally:
+            await rooms.stop(float(config["DRAIN_TIMEOUT"]))
+            await rooms.close()
+            await bus.close()
+            await metrics.close()
+
+    asyncio.run(main())
+
+
+@app.main_process_ready
+async def start_producer(app, _):
+    if int(app.config.WORKERS) > 1:
+        config = {key: app.config[key] for key in CAVE_CONFIG}
+        app.manager.manage("ThoughtProducer", produce, {"config": config})
+
+
 @app.before_server_start
-async def setup_cave(app, loop):
-    app.ctx.cave = Cave()
-    app.ctx.cave.add_thinker(WikipediaThinker("WikipediaThinker"))
-    app.ctx.cave.add_thinker(LOCThinker("LOCThinker"))
-    app.ctx.cave.add_thinker(OpenLibraryThinker("OpenLibraryThinker"))
-    app.add_task(app.ctx.cave.contemplate())
+async def setup_rooms(app, loop):
+    app.ctx.clients = {"ws": 0, "sse": 0, "poll": 0}
+    # Handler tasks serving /ws, /sse and /poll, for draining on shutdown
+    app.ctx.streams = set()
+    app.ctx.draining = False
+    if int(app.config.WORKERS) > 1:
+        # Workers only mirror the producer's chains and fan them out
+        app.ctx.rooms = rooms = mirror_rooms(app.config)
+        app.ctx.bus = bus = ThoughtBusClient(app.config.THOUGHT_BUS, lambda room, *thought: (
+            (cave := rooms.get(room)) and cave.receive(*thought)
+        ))
+        rooms.on_cave.append(lambda cave: cave.audience_listeners.append(
+            lambda audience, room=cave.room: bus.report(room, audience)
+        ))
+        app.add_task(bus.run(), name="thought_bus")
+    else:
+        app.ctx.bus = None
+        app.ctx.warm = {"store": False, "thinkers": False, "nlp": False}
+        app.ctx.rooms = build_rooms(app.config)
+        app.add_task(think(app.ctx.rooms, app.ctx.warm))
+    app.ctx.rooms.get(DEFAULT_ROOM)
+    audience_gauge.set_function(app.ctx.rooms.audience)
+
+
+@app.before_server_stop
+async def drain(app, loop):
+    # Stop taking clients, hand the connected ones back so they reconnect
+    # (with ?since=) elsewhere, and let thoughts in flight land, all within
+    # DRAIN_TIMEOUT. Websockets close with 1001, SSE streams end, long polls
+    # answer with what they have.
+    started = time.monotonic()
+    timeout = float(app.config.DRAIN_TIMEOUT)
+    app.ctx.draining = True
+    streams = list(app.ctx.streams)
+    for task in streams:
+        task.cancel()
+    await app.ctx.rooms.stop(timeout)
+    if streams:
+        _, pending = await asyncio.wait(streams, timeout=max(0.0, timeout - (time.monotonic() - started)))
+        if pending:
+            logger.warning(f"{len(pending)} clients were not drained in time")
+    logger.info(f"Drained {len(streams)} clients in {time.monotonic() - started:.2f}s")
+
+
+@app.after_server_stop
+async def close_rooms(app, loop):
+    if app.ctx.bus is not None:
+        await app.cancel_task("thought_bus", raise_exception=False)
+    await app.ctx.rooms.close()
 
 
 @app.get("/")
@@ -34,41 +424,290 @@ async def hello_world(request):
     return sanic.response.text("Hello, World! v1.0.2")
 
 
+@app.get("/ready")
+async def ready(request):
+    # 503 until the thinking pipeline is warmed up; on a multi-worker
+    # setup, until this worker is following the producer's thought bus
+    if app.ctx.draining:
+        return sanic.response.json({"ready": False, "draining": True}, status=503)
+    if app.ctx.bus is not None:
+        checks, info = {"bus": app.ctx.bus.connected}, {}
+    else:
+        # Without a spaCy model the regex fallback is used, which still counts
+        checks, info = dict(app.ctx.warm), {"nlp_model": get_nlp().available}
+    is_ready = all(checks.values())
+    return sanic.response.json({"ready": is_ready, **checks, **info}, status=200 if is_ready else 503)
+
+
+@app.get("/health")
+async def health(request):
+    # Liveness of every thinker loop, by room: running, idle (nobody
+    # watching), backoff (restarting after a crash) or stalled (running but
+    # silent), with restart counts and the last error. On a multi-worker
+    # setup the thinkers run in the producer process, so there is nothing
+    # to report here.
+    return sanic.response.json({"draining": app.ctx.draining, "rooms": app.ctx.rooms.health()})
+
+
 @app.get("/prometheus")
 async def prometheus_metrics(request):
-    registry = CollectorRegistry()
-    registry.register(word_occurrence_counter)
-
+    # On a multi-worker setup, this worker's clients plus the producer's
+    # thinking; the producer's part is left out while it is unreachable
+    if app.ctx.bus is None:
+        cave_metrics = generate_latest(cave_registry)
+    else:
+        try:
+            cave_metrics = await fetch_metrics(app.config.PRODUCER_METRICS)
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"Producer metrics unavailable: {e}")
+            cave_metrics = b""
     return sanic.response.raw(
-        generate_latest(registry),
+        generate_latest(registry) + cave_metrics,
         content_type=CONTENT_TYPE_LATEST
     )
 
 
-@app.websocket("/ws")
-async def feed(request: Request, ws: Websocket):
+@app.get("/history", name="history")
+@app.get("/history/<room>", name="room_history")
+async def history(request, room: str = DEFAULT_ROOM):
+    # The last HISTORY_SIZE thoughts of a room, oldest first. Clients
+    # revalidate with If-None-Match and get a 304 until a new thought is
+    # published.
+    cave = app.ctx.rooms.get(room, create=False)
+    if cave is None:
+        return sanic.response.text("Not Found", status=404)
+    latest = cave.thoughts.latest
+    etag = f'"{latest.seq}-{latest.ts}"' if latest else '"empty"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("If-None-Match") == etag:
+        return sanic.response.empty(status=304, headers=headers)
+    return sanic.response.raw(
+        cave.history_frame(), content_type="application/json", headers=headers
+    )
+
+
+@app.get("/admin/profile")
+async def profile(request):
+    # cProfile the event loop thread for ?seconds=N and return the top of the
+    # cumulative-time pstats report. Off unless SANIC_PROFILER is set.
+    if not app.config.PROFILER:
+        return sanic.response.text("Not Found", status=404)
+    if getattr(app.ctx, "profiling", False):
+        return sanic.response.text("A profile is already running", status=409)
+    try:
+        seconds = min(float(request.args.get("seconds", 10)), app.config.PROFILER_MAX_SECONDS)
+    except ValueError:
+        return sanic.response.text("seconds must be a number", status=400)
+
+    app.ctx.profiling = True
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+        app.ctx.profiling = False
+
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(50)
+    return sanic.response.text(report.getvalue())
+
+
+def parse_since(request: Request) -> int | None:
+    # The Last-Event-ID an EventSource sends on reconnect, else ?since=<seq>.
+    # The header wins: the browser reconnects to the URL it was first given,
+    # so its ?since= is as old as the stream.
+    since = request.headers.get("Last-Event-ID", request.args.get("since"))
+    try:
+        return int(since) if since is not None else None
+    except ValueError:
+        return None
+
+
+def admit(transport: str) -> bool:
+    # Take a connection slot for ``transport``, unless it is at its cap or
+    # the server is shutting down
+    cap = int(app.config[f"MAX_{transport.upper()}_CLIENTS"])
+    if app.ctx.draining or cap and app.ctx.clients[transport] >= cap:
+        connections_rejected_counter.labels(transport=transport).inc()
+        return False
+    app.ctx.clients[transport] += 1
+    app.ctx.streams.add(asyncio.current_task())
+    return True
+
+
+def leave(transport: str):
+    app.ctx.clients[transport] -= 1
+    app.ctx.streams.discard(asyncio.current_task())
+
+
+def drained() -> bool:
+    # Whether a CancelledError in a /ws, /sse or /poll handler came from
+    # drain(); if so the handler wraps up instead of letting it propagate
+    if not app.ctx.draining:
+        return False
+    asyncio.current_task().uncancel()
+    return True
+
+
+def too_busy() -> sanic.HTTPResponse:
+    return sanic.response.text("Too many clients", status=503, headers={"Retry-After": "10"})
+
+
+@app.websocket("/ws", name="feed")
+@app.websocket("/ws/<room>", name="room_feed")
+async def feed(request: Request, ws: Websocket, room: str = DEFAULT_ROOM):
+    # ?since=<seq> replays the thoughts published after <seq> before going
+    # live; without it the client starts from the latest thought.
+    # ?encoding=json|binary|msgpack picks the frame format (see frames.py).
+    encoding = request.args.get("encoding", JSON)
+    if encoding not in ENCODINGS:
+        await ws.close(code=1003, reason=f"Unsupported encoding, use one of: {', '.join(ENCODINGS)}")
+        return
+    sent_bytes = websocket_sent_bytes_counter.labels(encoding=encoding)
+    # How much of the thinker table a binary client has been sent
+    known_thinkers = 0
+    since = parse_since(request)
+    # Admitted before the room is looked up, so a client turned away does
+    # not create one (and perhaps push an idle room out to make space)
+    if not admit("ws"):
+        await ws.close(code=1013, reason="Too many clients")
+        return
+    cave = app.ctx.rooms.get(room)
+    if cave is None:
+        leave("ws")
+        await ws.close(code=1008, reason="No such room")
+        return
+    thoughts = cave.thoughts
+    subscriber = thoughts.subscribe(
+        int(app.config.WS_QUEUE_SIZE), app.config.WS_QUEUE_POLICY, prime=since is None
+    )
+    missed = deque(cave.catch_up(since) if since is not None else ())
+    websocket_clients_gauge.inc()
     try:
-        app.ctx.cave.wcs.append(ws)
-        last_thought = ""
         while True:
-            async with app.ctx.cave.get_thought() as thought_json:
-                if thought_json != last_thought:
-                    thought_data = json.loads(thought_json)
-                    word_occurrence_counter.labels(
-                        word=thought_data["thought"],
-                        thinker=thought_data["thinker"]
-                    ).inc()
-
-                    await ws.send(thought_json)
-                    last_thought = thought_json
-            await asyncio.sleep(0.5)
+            live = not missed
+            thought = await subscriber.get() if live else missed.popleft()
+            if subscriber.dropped:
+                websocket_dropped_counter.inc(subscriber.dropped)
+                subscriber.dropped = 0
+            frame = thought.frame(encoding)
+            try:
+                if encoding == BINARY and len(thinker_ids.names) > known_thinkers:
+                    known_thinkers = len(thinker_ids.names)
+                    await asyncio.wait_for(ws.send(thinker_ids.table()), float(app.config.WS_SEND_TIMEOUT))
+                await asyncio.wait_for(ws.send(frame), float(app.config.WS_SEND_TIMEOUT))
+            except asyncio.TimeoutError:
+                logger.warning(f"Evicting WebSocket that stopped accepting sends: {ws}")
+                websocket_evictions_counter.inc()
+                break
+            sent_bytes.inc(len(frame))
+            if live:
+                websocket_send_delay_histogram.observe(time.monotonic() - thought.published)
+    except asyncio.CancelledError:
+        if not drained():
+            raise
+        await ws.close(code=1001, reason="Server restarting")
     except Exception as e:
         logger.warning(f"WebSocket error with: {ws}, error: {e}")
     finally:
         logger.info(f"WebSocket disconnected: {ws}")
-        app.ctx.cave.wcs.remove(ws)
+        thoughts.unsubscribe(subscriber)
+        websocket_clients_gauge.dec()
+        leave("ws")
+
+
+@app.get("/sse", name="sse")
+@app.get("/sse/<room>", name="room_sse")
+async def sse(request: Request, room: str = DEFAULT_ROOM):
+    # The /ws feed as Server-Sent Events, for clients behind proxies that
+    # drop websockets. Resumes from ?since=<seq> or Last-Event-ID.
+    since = parse_since(request)
+    if not admit("sse"):
+        return too_busy()
+    try:
+        cave = app.ctx.rooms.get(room)
+        if cave is None:
+            return sanic.response.text("Not Found", status=404)
+        response = await request.respond(
+            content_type="text/event-stream",
+            # X-Accel-Buffering stops nginx from buffering the stream
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+        thoughts = cave.thoughts
+        subscriber = thoughts.subscribe(
+            int(app.config.WS_QUEUE_SIZE), app.config.WS_QUEUE_POLICY, prime=since is None
+        )
+        missed = deque(cave.catch_up(since) if since is not None else ())
+        stream_clients_gauge.labels(transport="sse").inc()
+        try:
+            await response.send(f"retry: {int(app.config.SSE_RETRY)}\n\n")
+            while True:
+                if missed:
+                    frame = missed.popleft().frame(SSE)
+                else:
+                    try:
+                        frame = (await asyncio.wait_for(subscriber.get(), float(app.config.SSE_KEEPALIVE))).frame(SSE)
+                    except asyncio.TimeoutError:
+                        frame = b": keep-alive\n\n"
+                if subscriber.dropped:
+                    stream_dropped_counter.labels(transport="sse").inc(subscriber.dropped)
+                    subscriber.dropped = 0
+                try:
+                    await asyncio.wait_for(response.send(frame), float(app.config.WS_SEND_TIMEOUT))
+                except asyncio.TimeoutError:
+                    logger.warning(f"Evicting SSE client that stopped accepting sends: {request.ip}")
+                    stream_evictions_counter.labels(transport="sse").inc()
+                    break
+        except asyncio.CancelledError:
+            if not drained():
+                raise
+            await response.eof()
+        except Exception as e:
+            logger.info(f"SSE client gone: {request.ip} ({e!r})")
+        finally:
+            thoughts.unsubscribe(subscriber)
+            stream_clients_gauge.labels(transport="sse").dec()
+    finally:
+        leave("sse")
+
 
+@app.get("/poll", name="poll")
+@app.get("/poll/<room>", name="room_poll")
+async def poll(request: Request, room: str = DEFAULT_ROOM):
+    # Long poll: a JSON array of the thoughts after ?since=<seq>, as soon as
+    # there is one, or [] after POLL_TIMEOUT. Without since, the latest
+    # thought. Waiting pollers share one wake-up per published thought.
+    since = parse_since(request)
+    if not admit("poll"):
+        return too_busy()
+    cave = app.ctx.rooms.get(room)
+    if cave is None:
+        leave("poll")
+        return sanic.response.text("Not Found", status=404)
+    thoughts = cave.thoughts
+    thoughts.hold()
+    stream_clients_gauge.labels(transport="poll").inc()
+    try:
+        frame = cave.poll_frame(since)
+        if frame == "[]":
+            try:
+                await asyncio.wait_for(thoughts.wait(thoughts.version), float(app.config.POLL_TIMEOUT))
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                if not drained():
+                    raise
+            frame = cave.poll_frame(since)
+    finally:
+        thoughts.release(float(app.config.POLL_LINGER))
+        stream_clients_gauge.labels(transport="poll").dec()
+        leave("poll")
+    return sanic.response.raw(frame, content_type="application/json", headers={"Cache-Control": "no-cache"})
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=1234)
+    app.run(
+        host="0.0.0.0", port=int(app.config.PORT), workers=int(app.config.WORKERS),
+        protocol=DeflateWebSocketProtocol
+    )
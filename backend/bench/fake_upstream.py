@@ -0,0 +1,125 @@
+"""Local stand-in for the Wikipedia, LOC and OpenLibrary APIs.
+
+Serves the recorded responses in ``bench/fixtures`` under ``/wikipedia``,
+``/loc`` and ``/openlibrary``, with configurable latency and error rate, so
+thinkers can be pointed at it through their ``base_url``.
+
+    python bench/fake_upstream.py --port 8900 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+from pathlib import Path
+
+from aiohttp import web
+
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def _load(name: str) -> dict:
+    with open(FIXTURES / f"{name}.json") as f:
+        return json.load(f)
+
+
+def _rank(entries: list[dict], query: str, limit: int = 10) -> list[dict]:
+    # Title matches first, then a random sample so unknown queries still
+    # lead somewhere
+    q = query.lower().strip('"').removeprefix('intitle:"').strip('"')
+    matches = [e for e in entries if q and q in e["title"].lower()]
+    rest = [e for e in entries if e not in matches]
+    return (matches + random.sample(rest, len(rest)))[:limit]
+
+
+class FakeUpstream:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.wikipedia = _load("wikipedia")
+        self.loc = _load("loc")
+        self.openlibrary = _load("openlibrary")
+        self.app = web.Application(middlewares=[self._conditions])
+        self.app.router.add_get("/wikipedia/w/api.php", self.wikipedia_api)
+        self.app.router.add_get("/wikipedia/api/rest_v1/page/summary/{title}", self.wikipedia_summary)
+        self.app.router.add_get("/loc/search/", self.loc_search)
+        self.app.router.add_get("/openlibrary/search.json", self.openlibrary_search)
+        self.app.router.add_route("HEAD", "/", self.probe)
+        self._runner: web.AppRunner | None = None
+
+    @web.middleware
+    async def _conditions(self, request: web.Request, handler):
+        self.requests += 1
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if random.random() < self.error_rate:
+            return web.Response(status=503)
+        return await handler(request)
+
+    async def probe(self, request: web.Request):
+        return web.Response()
+
+    async def wikipedia_api(self, request: web.Request):
+        if request.query.get("list") == "search":
+            hits = _rank(self.wikipedia["search"], request.query.get("srsearch", ""),
+                         int(request.query.get("srlimit", 10)))
+            return web.json_response({"batchcomplete": "", "query": {
+                "searchinfo": {"totalhits": len(hits)}, "search": hits
+            }})
+        if request.query.get("prop") == "extracts":
+            title = request.query.get("titles", "")
+            page = self.wikipedia["summaries"].get(title)
+            pages = {"-1": {"title": title, "missing": ""}} if page is None else {
+                "1": {"pageid": 1, "title": title, "extract": page["extract"]}
+            }
+            return web.json_response({"batchcomplete": "", "query": {"pages": pages}})
+        return web.json_response({"error": {"code": "badvalue"}}, status=400)
+
+    async def wikipedia_summary(self, request: web.Request):
+        page = self.wikipedia["summaries"].get(request.match_info["title"])
+        if page is None:
+            return web.json_response({"type": "not_found"}, status=404)
+        return web.json_response(page)
+
+    async def loc_search(self, request: web.Request):
+        results = _rank(self.loc["results"], request.query.get("q", ""), int(request.query.get("c", 10)))
+        return web.json_response({"results": results})
+
+    async def openlibrary_search(self, request: web.Request):
+        docs = _rank(self.openlibrary["docs"], request.query.get("title", ""), int(request.query.get("limit", 10)))
+        return web.json_response({"numFound": len(docs), "docs": docs})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base URL."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 503")
+    args = parser.parse_args()
+
+    async def main():
+        upstream = FakeUpstream(args.latency, args.jitter, args.error_rate)
+        url = await upstream.start(args.host, args.port)
+        print(f"Serving fake upstreams on {url}/wikipedia, {url}/loc and {url}/openlibrary")
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
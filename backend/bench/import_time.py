@@ -0,0 +1,74 @@
+"""Import-time budget for the backend.
+
+Imports a module (``app`` by default) in fresh interpreters under
+``python -X importtime`` and reports the best cumulative time along with the
+slowest imports, as JSON. With ``--budget-ms`` it exits non-zero when the
+import takes longer, so a regression can fail a build.
+
+    python bench/import_time.py --runs 5 --budget-ms 400
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+
+backend_path = Path(__file__).resolve().parent.parent
+
+
+def measure(module: str) -> dict[str, tuple[int, int]]:
+    """One cold import: ``{module: (self_us, cumulative_us)}``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_path, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main(args):
+    runs = [measure(args.module) for _ in range(args.runs)]
+    totals = [run[args.module][1] / 1000 for run in runs]
+    best = runs[totals.index(min(totals))]
+    slowest = sorted(best.items(), key=lambda item: item[1][1], reverse=True)[1:args.top + 1]
+
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "best_ms": min(totals),
+        "median_ms": statistics.median(totals),
+        "budget_ms": args.budget_ms,
+        "slowest": [
+            {"module": name, "cumulative_ms": cumulative / 1000, "self_ms": own / 1000}
+            for name, (own, cumulative) in slowest
+        ],
+        "heavy_imported": sorted(name for name in args.heavy if name in best),
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.budget_ms and min(totals) > args.budget_ms:
+        print(f"import {args.module} took {min(totals):.0f}ms, over the {args.budget_ms}ms budget",
+              file=sys.stderr)
+        return 1
+    if report["heavy_imported"]:
+        print(f"import {args.module} pulled in {', '.join(report['heavy_imported'])}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--budget-ms", type=float, default=0, help="fail above this; 0 only reports")
+    parser.add_argument("--heavy", nargs="*", default=["aiohttp", "spacy"],
+                        help="modules that must stay out of the import")
+    sys.exit(main(parser.parse_args()))
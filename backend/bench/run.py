@@ -0,0 +1,241 @@
+"""Offline benchmark for the thinkers, the NLP service and websocket fan-out.
+
+Everything runs against ``bench/fake_upstream.py``, never the live APIs.
+Results are printed (or written with ``--output``) as JSON so runs from
+different commits can be diffed. With ``--corpus`` the fan-out server
+replays a corpus recorded with ``SANIC_TRANSPORT=record`` instead, so runs
+see identical upstream responses.
+
+    python bench/run.py --thoughts 100 --clients 200 --duration 15
+    python bench/run.py --clients 500 --corpus corpus.jsonl.gz --replay-speed 0
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+
+backend_path = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_path))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from cache import MemoryCache
+from extraction import extract_candidates
+from fake_upstream import FakeUpstream
+from nlp import get_nlp
+import upstream
+from thinkers.thinker_wikipedia import WikipediaThinker
+from thinkers.thinker_loc import LOCThinker
+from thinkers.thinker_openlibrary import OpenLibraryThinker
+
+
+THINKERS = {
+    "wikipedia": WikipediaThinker,
+    "loc": LOCThinker,
+    "openlibrary": OpenLibraryThinker,
+}
+
+
+def summarize(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50) * 1000,
+        "p99_ms": pick(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+async def bench_think(base_url: str, thoughts: int, cached: bool) -> dict:
+    results = {}
+    for source, cls in THINKERS.items():
+        # A zero-sized cache means every think() goes to the (fake) network
+        thinker = cls(cls.__name__, cache=MemoryCache(maxsize=4096 if cached else 0),
+                      base_url=f"{base_url}/{source}")
+        await thinker.open()
+        latencies = []
+        thought = "Stake"
+        started = time.perf_counter()
+        for _ in range(thoughts):
+            t0 = time.perf_counter()
+            thought = await thinker.think(thought)
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+        await thinker.close()
+        results[source] = {"thoughts_per_sec": thoughts / elapsed, "think": summarize(latencies)}
+    return results
+
+
+async def bench_nlp(rounds: int, concurrency: int) -> dict:
+    with open(Path(__file__).resolve().parent / "fixtures" / "wikipedia.json") as f:
+        sentences = [page["extract"] for page in json.load(f)["summaries"].values()]
+    nlp = get_nlp()
+    model = await nlp.load()
+
+    parse_latencies = []
+
+    async def parse(sentence: str):
+        t0 = time.perf_counter()
+        await nlp.parse(sentence)
+        parse_latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    for i in range(rounds):
+        batch = [sentences[(i * concurrency + j) % len(sentences)] for j in range(concurrency)]
+        await asyncio.gather(*(parse(s) for s in batch))
+    elapsed = time.perf_counter() - started
+
+    extract_latencies = []
+    for sentence in sentences:
+        t0 = time.perf_counter()
+        await extract_candidates(sentence, "", nlp)
+        extract_latencies.append(time.perf_counter() - t0)
+
+    return {
+        "model_loaded": model,
+        "sentences_per_sec": rounds * concurrency / elapsed,
+        "parse": summarize(parse_latencies),
+        "extract_cold": summarize(extract_latencies),
+    }
+
+
+async def bench_fanout(base_url: str, clients: int, duration: float, port: int,
+                       corpus: str | None = None, replay_speed: float = 0, encoding: str = "json") -> dict:
+    env = dict(
+        os.environ,
+        SANIC_PORT=str(port),
+        SANIC_WIKIPEDIA_URL=f"{base_url}/wikipedia",
+        SANIC_LOC_URL=f"{base_url}/loc",
+        SANIC_OPENLIBRARY_URL=f"{base_url}/openlibrary",
+    )
+    if corpus:
+        env.update(
+            SANIC_TRANSPORT="replay",
+            SANIC_TRANSPORT_CORPUS=str(Path(corpus).resolve()),
+            SANIC_REPLAY_SPEED=str(replay_speed),
+        )
+    server = subprocess.Popen(
+        [sys.executable, "app.py"], cwd=backend_path, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        async with aiohttp.ClientSession() as session:
+            for _ in range(100):
+                try:
+                    async with session.get(f"{url}/"):
+                        break
+                except aiohttp.ClientError:
+                    await asyncio.sleep(0.2)
+            else:
+                return {"error": "server did not start"}
+
+            arrivals: dict[str, list[float]] = {}
+            received = [0] * clients
+            received_bytes = 0
+            connect_failures = 0
+
+            async def client(i: int):
+                nonlocal connect_failures, received_bytes
+                try:
+                    async with session.ws_connect(f"{url}/ws?encoding={encoding}") as ws:
+                        deadline = time.perf_counter() + duration
+                        while (remaining := deadline - time.perf_counter()) > 0:
+                            try:
+                                msg = await ws.receive(timeout=remaining)
+                            except asyncio.TimeoutError:
+                                break
+                            if msg.type not in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                                break
+                            if encoding == "binary" and msg.type == aiohttp.WSMsgType.TEXT:
+                                continue  # thinker table
+                            received_bytes += len(msg.data)
+                            arrivals.setdefault(msg.data, []).append(time.perf_counter())
+                            received[i] += 1
+                except aiohttp.ClientError:
+                    connect_failures += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(client(i) for i in range(clients)))
+            elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    # Skew: time between the first and the last client receiving a frame
+    skews = [max(times) - min(times) for times in arrivals.values() if len(times) > 1]
+    return {
+        "clients": clients,
+        "connect_failures": connect_failures,
+        "distinct_thoughts": len(arrivals),
+        "frames_per_sec": sum(received) / elapsed,
+        "frames_per_client": statistics.fmean(received) if received else 0,
+        "encoding": encoding,
+        "bytes_per_frame": received_bytes / sum(received) if sum(received) else 0,
+        "delivery_skew": summarize(skews),
+    }
+
+
+async def main(args):
+    logging.getLogger().setLevel(logging.WARNING)
+    # The stub is one host; lift the per-host budget so it is not the bottleneck
+    upstream.Upstream.rate = upstream.Upstream.burst = 1_000_000
+
+    fake = FakeUpstream(args.latency, args.jitter, args.error_rate)
+    base_url = await fake.start()
+    try:
+        results = {
+            "commit": subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=backend_path,
+                capture_output=True, text=True
+            ).stdout.strip() or None,
+            "timestamp": time.time(),
+            "config": vars(args),
+            "think": await bench_think(base_url, args.thoughts, cached=False),
+            "think_cached": await bench_think(base_url, args.thoughts, cached=True),
+            "nlp": await bench_nlp(args.nlp_rounds, args.nlp_concurrency),
+        }
+        if args.clients:
+            results["fanout"] = await bench_fanout(
+                base_url, args.clients, args.duration, args.port, args.corpus, args.replay_speed,
+                args.encoding
+            )
+        results["upstream_requests"] = fake.requests
+    finally:
+        await fake.stop()
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    print(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--thoughts", type=int, default=50, help="think() calls per thinker")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--nlp-rounds", type=int, default=20)
+    parser.add_argument("--nlp-concurrency", type=int, default=8, help="sentences parsed concurrently")
+    parser.add_argument("--clients", type=int, default=100, help="websocket clients; 0 skips fan-out")
+    parser.add_argument("--duration", type=float, default=10, help="fan-out run length in seconds")
+    parser.add_argument("--port", type=int, default=1299, help="port for the app.py under test")
+    parser.add_argument("--corpus", help="recorded corpus for the fan-out server to replay")
+    parser.add_argument("--replay-speed", type=float, default=0, help="replay speed-up; 0 for no delay")
+    parser.add_argument("--encoding", default="json", choices=["json", "binary", "msgpack"],
+                        help="frame encoding the fan-out clients ask for")
+    parser.add_argument("--output", help="also write the JSON report here")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,126 @@
+import asyncio
+from collections import deque
+from typing import Callable, Generic, TypeVar
+
+
+T = TypeVar("T")
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+
+
+class Subscriber(Generic[T]):
+    """Bounded per-subscriber queue fed by a ``Broadcaster``.
+
+    When full, ``drop_oldest`` discards the oldest queued item and
+    ``coalesce`` keeps only the latest one, so a slow consumer never holds
+    more than ``maxsize`` items.
+    """
+
+    def __init__(self, maxsize: int = 8, policy: str = DROP_OLDEST):
+        if policy not in (DROP_OLDEST, COALESCE):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.policy = policy
+        self.dropped = 0
+        self._queue: deque[T] = deque(maxlen=maxsize)
+        self._ready = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def put(self, item: T):
+        if self.policy == COALESCE:
+            self.dropped += len(self._queue)
+            self._queue.clear()
+        elif len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append(item)
+        self._ready.set()
+
+    async def get(self) -> T:
+        while not self._queue:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._queue.popleft()
+
+
+class Broadcaster(Generic[T]):
+    """Publishes items to a set of subscribers and version-stamped waiters.
+
+    Publishing is synchronous and lock-free: it bumps the version, stores the
+    item, wakes every ``wait()`` caller at once and appends the item to each
+    subscriber's queue. Registering and unregistering are O(1).
+
+    Clients that only ``wait()`` (long polls) can ``hold()`` the broadcaster
+    so that they count towards its audience like subscribers do.
+    """
+
+    def __init__(self):
+        self._version = 0
+        self._latest: T | None = None
+        self._changed = asyncio.Event()
+        self._subscribers: set[Subscriber[T]] = set()
+        self._held = 0
+        # Called with the new audience (subscribers and holds) whenever it changes
+        self.on_subscribers: Callable[[int], None] | None = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def latest(self) -> T | None:
+        return self._latest
+
+    def __len__(self) -> int:
+        return len(self._subscribers) + self._held
+
+    def publish(self, item: T):
+        self._version += 1
+        self._latest = item
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        for subscriber in self._subscribers:
+            subscriber.put(item)
+
+    async def wait(self, version: int) -> tuple[int, T]:
+        """Wait until something newer than ``version`` is published."""
+        while self._version <= version:
+            await self._changed.wait()
+        return self._version, self._latest
+
+    def subscribe(self, maxsize: int = 8, policy: str = DROP_OLDEST,
+                  prime: bool = True) -> Subscriber[T]:
+        """Register a subscriber, primed with the latest item unless ``prime`` is off."""
+        subscriber = Subscriber(maxsize, policy)
+        if prime and self._latest is not None:
+            subscriber.put(self._latest)
+        self._subscribers.add(subscriber)
+        self._subscribers_changed()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber[T]):
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+            self._subscribers_changed()
+
+    def hold(self):
+        """Count one client that is not a subscriber until ``release()``."""
+        self._held += 1
+        self._subscribers_changed()
+
+    def release(self, linger: float = 0):
+        """Undo a ``hold()``, ``linger`` seconds from now.
+
+        A long-poll client is away between its requests; lingering keeps it
+        counted across that gap instead of flapping the audience to zero.
+        """
+        if linger > 0:
+            asyncio.get_running_loop().call_later(linger, self.release)
+            return
+        self._held -= 1
+        self._subscribers_changed()
+
+    def _subscribers_changed(self):
+        if self.on_subscribers is not None:
+            self.on_subscribers(len(self))
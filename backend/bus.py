@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Callable
+
+
+logger = logging.getLogger(__name__)
+
+
+class ThoughtBus:
+    """Unix socket server fanning published thoughts out to worker processes.
+
+    Each thought goes out once per connected worker as its JSON frame plus a
+    newline. A worker that stops reading is dropped once its write buffer
+    passes ``max_buffer`` bytes; it reconnects and picks up the latest
+    thought of every room. Workers send back their subscriber count per
+    room, one ``<room> <count>`` line at a time, and ``on_audience`` gets
+    the room's total across workers.
+    """
+
+    max_buffer = 1 << 20
+
+    def __init__(self, path: str, on_audience: Callable[[str, int], None] | None = None):
+        self.path = path
+        self.on_audience = on_audience
+        self._server: asyncio.AbstractServer | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._handlers: set[asyncio.Task] = set()
+        self._audience: dict[asyncio.StreamWriter, dict[str, int]] = {}
+        self._latest: dict[str, bytes] = {}
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._connected, path=self.path)
+        logger.info(f"Thought bus listening on {self.path}")
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for writer in list(self._writers):
+            writer.close()
+        self._writers.clear()
+        # Let the connection handlers see their sockets close and finish,
+        # rather than be cancelled under asyncio's feet at loop shutdown
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _connected(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        self._handlers.add(asyncio.current_task())
+        audience = self._audience[writer] = {}
+        writer.writelines(self._latest.values())
+        try:
+            while line := await reader.readline():
+                room, count = line.decode().split()
+                audience[room] = int(count)
+                self._audience_changed(room)
+        except ValueError as e:
+            logger.warning(f"Dropping thought bus subscriber with a bad audience report: {e}")
+        except OSError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            for room, count in self._audience.pop(writer).items():
+                if count:
+                    self._audience_changed(room)
+            writer.close()
+
+    def _audience_changed(self, room: str):
+        if self.on_audience is not None:
+            self.on_audience(room, sum(rooms.get(room, 0) for rooms in self._audience.values()))
+
+    def publish(self, message: str, room: str = ""):
+        self._latest[room] = frame = message.encode() + b"\n"
+        for writer in list(self._writers):
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                logger.warning("Dropping thought bus subscriber that stopped reading")
+                self._writers.discard(writer)
+                writer.close()
+                continue
+            writer.write(frame)
+
+
+class ThoughtBusClient:
+    """Follows a ``ThoughtBus`` and hands every thought to ``receive``.
+
+    ``report()`` tells the producer how many subscribers this worker has in
+    a room.
+    """
+
+    def __init__(self, path: str, receive: Callable[[str, str, str, int, float], None],
+                 min_backoff: float = 0.1, max_backoff: float = 5):
+        self.path = path
+        self.receive = receive
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.audience: dict[str, int] = {}
+        self.connected = False
+        self._writer: asyncio.StreamWriter | None = None
+
+    def report(self, room: str, audience: int):
+        if audience:
+            self.audience[room] = audience
+        else:
+            self.audience.pop(room, None)
+        if self._writer is not None:
+            self._writer.write(f"{room} {audience}\n".encode())
+
+    async def run(self):
+        backoff = self.min_backoff
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                logger.debug(f"Thought bus {self.path} not reachable yet: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            backoff = self.min_backoff
+            logger.info(f"Subscribed to thought bus {self.path}")
+            self._writer = writer
+            self.connected = True
+            for room, audience in list(self.audience.items()):
+                self.report(room, audience)
+            try:
+                while line := await reader.readline():
+                    data = json.loads(line)
+                    self.receive(data["room"], data["thinker"], data["thought"], data["seq"], data["ts"])
+            except (OSError, ValueError) as e:
+                logger.warning(f"Thought bus connection lost: {e}")
+            finally:
+                self._writer = None
+                self.connected = False
+                writer.close()
+            await asyncio.sleep(backoff)
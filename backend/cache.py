@@ -0,0 +1,100 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import time
+from typing import Any, Hashable
+
+from prometheus_client import Counter, Gauge
+
+
+cache_requests_counter = Counter(
+    'upstream_cache_requests_total',
+    'Upstream response cache lookups by source and result',
+    ['source', 'result']
+)
+
+cache_entries_gauge = Gauge(
+    'upstream_cache_entries',
+    'Entries currently held in the upstream response cache'
+)
+
+
+class ResponseCache(ABC):
+    @abstractmethod
+    async def get(self, key: Hashable, stale: bool = False) -> tuple[bool, Any]:
+        """Return ``(hit, value)`` for a live entry, or an expired one if ``stale``."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: Hashable, value: Any, ttl: float):
+        raise NotImplementedError
+
+
+class LRUCache:
+    """Bounded LRU mapping whose entries expire after a per-entry TTL.
+
+    Expired entries are not dropped until the LRU evicts them, so they can
+    still be served on request when the live source is unavailable.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, stale: bool = False) -> tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if stale or expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+        self.misses += 1
+        return False, None
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl is not None else float("inf")
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class MemoryCache(ResponseCache):
+    def __init__(self, maxsize: int = 4096):
+        self._lru = LRUCache(maxsize)
+
+    async def get(self, key: Hashable, stale: bool = False) -> tuple[bool, Any]:
+        return self._lru.get(key, stale)
+
+    async def set(self, key: Hashable, value: Any, ttl: float):
+        self._lru.set(key, value, ttl)
+        cache_entries_gauge.set(len(self._lru))
+
+
+def cache_key(url: str, params: dict | None = None) -> tuple:
+    """Endpoint plus whitespace-normalized, order-independent params."""
+    items = tuple(sorted(
+        (name, " ".join(str(value).split())) for name, value in (params or {}).items()
+    ))
+    return url, items
+
+
+_cache: ResponseCache | None = None
+
+
+def get_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = MemoryCache()
+    return _cache
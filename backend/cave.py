@@ -1,48 +1,503 @@
 
 import asyncio
-from contextlib import asynccontextmanager
+import logging
+from dataclasses import dataclass, field
+from functools import partial
 import json
 import random
+import time
+from typing import Awaitable, Callable
 
-from sanic import Websocket
-from thinker import Thinker
-from thinkers.thinker_wikipedia import WikipediaThinker
-from thinkers.thinker_loc import LOCThinker
-from thinkers.thinker_openlibrary import OpenLibraryThinker
+from prometheus_client import Counter, Gauge, Histogram
+from broadcast import Broadcaster
+import frames
+from history import RingBuffer
+from metrics import ThoughtWords
+from pacing import Pacer
+from store import ThoughtStore
+from thinker import FallbackThought, Thinker
+
+
+logger = logging.getLogger(__name__)
+
+think_histogram = Histogram(
+    'thinker_think_seconds',
+    'Time from reading the current thought to having the next one',
+    ['thinker']
+)
+
+race_histogram = Histogram(
+    'thought_race_seconds',
+    'Time from starting a race to its first usable thought'
+)
+
+commits_counter = Counter(
+    'thought_commits_total',
+    'Thought commit attempts by thinker and outcome',
+    ['thinker', 'result']
+)
+
+
+thinker_loops_gauge = Gauge(
+    'thinker_loops',
+    'Supervised thinker loops by state, over all rooms',
+    ['thinker', 'state']
+)
+
+thinker_restarts_counter = Counter(
+    'thinker_restarts',
+    'Thinker loops restarted after crashing',
+    ['thinker']
+)
+
+
+DEFAULT_ROOM = "default"
+
+# Thinker loop states: thinking, paused for lack of an audience, waiting to
+# be restarted after a crash, and gone (not counted by the gauge)
+RUNNING = "running"
+IDLE = "idle"
+BACKOFF = "backoff"
+STOPPED = "stopped"
+
+
+@dataclass(frozen=True, slots=True)
+class Thought:
+    thinker: str
+    thought: str
+    seq: int = 0
+    ts: float = field(default_factory=time.time)
+    room: str = DEFAULT_ROOM
+    published: float = field(default_factory=time.monotonic, compare=False)
+    message: str = field(init=False)
+    _frames: dict[str, str | bytes] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Encoded once here and shared by every subscriber
+        object.__setattr__(self, "message", json.dumps({
+            "room": self.room,
+            "seq": self.seq,
+            "ts": self.ts,
+            "thinker": self.thinker,
+            "thought": self.thought
+        }))
+
+    def frame(self, encoding: str = frames.JSON) -> str | bytes:
+        """The thought as a websocket frame, encoded once per encoding."""
+        frame = self._frames.get(encoding)
+        if frame is None:
+            frame = self._frames[encoding] = frames.encode(self, encoding)
+        return frame
+
+
+@dataclass(slots=True)
+class Liveness:
+    """How one thinker's loop in a cave is doing."""
+    thinker: str
+    state: str = STOPPED
+    restarts: int = 0
+    # Whether a think() is in flight, which a graceful stop waits for
+    thinking: bool = False
+    beat: float = field(default_factory=time.monotonic)
+    error: str | None = None
+
+    def set(self, state: str):
+        if state == self.state:
+            return
+        if self.state != STOPPED:
+            thinker_loops_gauge.labels(thinker=self.thinker, state=self.state).dec()
+        if state != STOPPED:
+            thinker_loops_gauge.labels(thinker=self.thinker, state=state).inc()
+        self.state = state
+
+    def report(self, stall_after: float) -> dict:
+        since_beat = time.monotonic() - self.beat
+        return {
+            "state": "stalled" if self.state == RUNNING and since_beat > stall_after else self.state,
+            "restarts": self.restarts,
+            "since_beat": round(since_beat, 3),
+            "error": self.error,
+        }
+
+
+# Scheduling modes: every thinker runs its own loop, or all thinkers race on
+# the current thought and the first real answer wins
+INDEPENDENT = "independent"
+RACE = "race"
 
 
 class Cave:
-    def __init__(self):
-        self.wcs: list[Websocket] = []
+    # Upper bound on speculative thinker prefetches running at once
+    max_prefetches = 6
+    # In independent mode, how many of the thinkers due next get a prefetch
+    prefetch_next = 1
+    # Distinct long-poll answers kept per published thought
+    max_poll_frames = 64
+    # Weight of the newest sample in each thinker's race latency average
+    race_latency_weight = 0.3
+    # Restart delays for a crashed thinker loop: doubling from min to max,
+    # and back to min once a loop has stayed up for healthy_after seconds
+    min_backoff = 1.0
+    max_backoff = 60.0
+    healthy_after = 60.0
+    # A running loop without a beat for this long is reported as stalled
+    stall_after = 120.0
+
+    def __init__(self, store: ThoughtStore | None = None, words: ThoughtWords | None = None,
+                 history_size: int = 100, mode: str = INDEPENDENT, hedge_delay: float = 0,
+                 pacer: Pacer | None = None, room: str = DEFAULT_ROOM, seed: str = "stake"):
+        if mode not in (INDEPENDENT, RACE):
+            raise ValueError(f"Unknown cave mode: {mode}")
+        self.room = room
+        self.mode = mode
+        # In race mode, how long the fastest thinker gets on its own before the
+        # others join; 0 starts them all together
+        self.hedge_delay = hedge_delay
+        self.race_latency: dict[str, float] = {}
+        self.pacer = pacer or Pacer()
         self.thinkers: list[Thinker] = []
-        self.shared_thought = "stake"
-        self.shared_message = ""
-        self.lock = asyncio.Lock()
+        self.store = store
+        self.words = words or ThoughtWords()
+        self.shared_thought = seed
+        self.thoughts: Broadcaster[Thought] = Broadcaster()
+        self.thoughts.on_subscribers = self.set_audience
+        self.generation = 0
+        # The last published thoughts, for clients catching up on reconnect
+        self.history: RingBuffer[Thought] = RingBuffer(history_size)
+        self._history_frame: tuple[int, str] | None = None
+        # Long-poll responses for the current version, by the client's since
+        self._poll_frames: tuple[int, dict[int | None, str]] = (0, {})
+        self.prefetches: set[asyncio.Task] = set()
+        # When each thinker's loop is due to think next (independent mode)
+        self.due: dict[str, float] = {}
+        self.liveness: dict[str, Liveness] = {}
+        self.stopping = False
+        self._loops: list[tuple[asyncio.Task, list[Liveness]]] = []
+        # Called with every published thought's encoded frame (e.g. a bus)
+        self.listeners: list[Callable[[str], None]] = []
+        # Called with the number of subscribers whenever it changes (e.g. a
+        # worker telling the producer over the bus)
+        self.audience_listeners: list[Callable[[int], None]] = []
 
     def add_thinker(self, thinker: Thinker):
+        thinker.store = self.store
         self.thinkers.append(thinker)
 
-    async def run_thinker(self, thinker: Thinker):
-        while True:
-            async with self.lock:
-                self.shared_thought = await thinker.think(thought = self.shared_thought)
-                self.shared_message = json.dumps({
-                    "thinker": thinker.get_name(),
-                    "thought": self.shared_thought
-                })
-            await asyncio.sleep(random.uniform(1, 3))
+    async def open(self):
+        await asyncio.gather(*(thinker.open() for thinker in self.thinkers))
+
+    async def close(self):
+        await asyncio.gather(*(thinker.close() for thinker in self.thinkers))
+        if self.store is not None:
+            await self.store.close()
+
+    def set_audience(self, audience: int):
+        self.pacer.watch(audience)
+        for listener in self.audience_listeners:
+            listener(audience)
+
+    async def run_thinker(self, thinker: Thinker, offset: float = 0):
+        # Each of the n thinkers aims for one thought every n intervals,
+        # staggered so together they keep the pacer's cadence
+        interval = self.pacer.interval * len(self.thinkers)
+        liveness = self.liveness[thinker.get_name()]
+        await asyncio.sleep(offset)
+        while not self.stopping:
+            liveness.set(RUNNING if self.pacer.watched else IDLE)
+            if await self.pacer.wait_for_audience():
+                # Everyone wakes up together; stagger them again
+                liveness.set(RUNNING)
+                await asyncio.sleep(offset)
+            await self.pacer.spend(thinker)
+            started = time.monotonic()
+            self.due[thinker.get_name()] = started + interval
+            thought, generation = self.shared_thought, self.generation
+            liveness.thinking = True
+            try:
+                with think_histogram.labels(thinker=thinker.get_name()).time():
+                    next_thought = await thinker.think(thought = thought)
+            finally:
+                liveness.thinking = False
+            liveness.beat = time.monotonic()
+            if not self.commit(thinker, next_thought, generation):
+                logger.debug(f"{thinker.get_name()} dropped stale thought: {next_thought}")
+            if self.stopping:
+                break
+            # Jittered by the thinker's own generator, so a seeded replay
+            # interleaves the thinkers the way the recording did
+            await self.pacer.pause(started, interval, thinker.rng)
+
+    async def run_races(self):
+        liveness = list(self.liveness.values())
+        while not self.stopping:
+            for entry in liveness:
+                entry.set(RUNNING if self.pacer.watched else IDLE)
+            if await self.pacer.wait_for_audience():
+                for entry in liveness:
+                    entry.set(RUNNING)
+            started = time.monotonic()
+            # Thinkers out of budget sit this race out
+            entrants = [thinker for thinker in self.thinkers if await self.pacer.spend(thinker, 0)]
+            if entrants:
+                racing = [self.liveness[thinker.get_name()] for thinker in entrants]
+                thought, generation = self.shared_thought, self.generation
+                for entry in racing:
+                    entry.thinking = True
+                try:
+                    with race_histogram.time():
+                        winner = await self.race(thought, entrants)
+                finally:
+                    for entry in racing:
+                        entry.thinking = False
+                        entry.beat = time.monotonic()
+                if winner is not None:
+                    thinker, next_thought = winner
+                    self.commit(thinker, next_thought, generation)
+            if self.stopping:
+                break
+            await self.pacer.pause(started)
+
+    async def supervise(self, liveness: list[Liveness], loop: Callable[[], Awaitable[None]]):
+        """Run ``loop`` until the cave stops, restarting it with backoff when it crashes."""
+        names = ", ".join(entry.thinker for entry in liveness)
+        failures = 0
+        try:
+            while not self.stopping:
+                started = time.monotonic()
+                for entry in liveness:
+                    entry.set(RUNNING)
+                try:
+                    await loop()
+                except Exception as e:
+                    if time.monotonic() - started > self.healthy_after:
+                        failures = 0
+                    delay = min(self.max_backoff, self.min_backoff * 2 ** failures)
+                    delay *= random.uniform(0.5, 1)
+                    failures += 1
+                    logger.exception(f"Thinker loop for {names} in room {self.room} crashed, "
+                                     f"restarting in {delay:.1f}s")
+                    for entry in liveness:
+                        entry.set(BACKOFF)
+                        entry.restarts += 1
+                        entry.error = repr(e)
+                        thinker_restarts_counter.labels(thinker=entry.thinker).inc()
+                    await asyncio.sleep(delay)
+        finally:
+            for entry in liveness:
+                entry.set(STOPPED)
+
+    async def stop(self, timeout: float = 0):
+        """Stop thinking, giving thoughts in flight up to ``timeout`` to land."""
+        self.stopping = True
+        busy = []
+        for task, liveness in self._loops:
+            if any(entry.thinking for entry in liveness):
+                busy.append(task)
+            else:
+                task.cancel()
+        if busy and timeout > 0:
+            _, pending = await asyncio.wait(busy, timeout=timeout)
+            if pending:
+                logger.warning(f"Cancelling {len(pending)} thinker loops in room {self.room} "
+                               f"still thinking after {timeout}s")
+        for task, _ in self._loops:
+            task.cancel()
+        await asyncio.gather(*(task for task, _ in self._loops), return_exceptions=True)
+        for task in self.prefetches:
+            task.cancel()
+
+    def health(self) -> dict[str, dict]:
+        return {name: entry.report(self.stall_after) for name, entry in self.liveness.items()}
+
+    async def race(self, thought: str, thinkers: list[Thinker] | None = None) -> tuple[Thinker, str] | None:
+        """Ask the thinkers for the next thought and return the first real one.
+
+        Thinkers start fastest first by their race latency so far. With a
+        ``hedge_delay`` the rest only start if the first has not answered by
+        then. The losers are cancelled; their responses still land in the
+        cache as fetches are shielded. If every thinker falls back, the first
+        fallback is returned so the chain keeps moving.
+        """
+        waiting = sorted(thinkers or self.thinkers, key=lambda t: self.race_latency.get(t.get_name(), 0))
+        running: dict[asyncio.Task, Thinker] = {}
+        started = time.monotonic()
+        fallback = None
+
+        def start(thinkers: list[Thinker]):
+            for thinker in thinkers:
+                running[asyncio.create_task(thinker.think(thought))] = thinker
+
+        if self.hedge_delay > 0:
+            start(waiting[:1])
+            waiting = waiting[1:]
+        else:
+            start(waiting)
+            waiting = []
+
+        try:
+            while running:
+                timeout = self.hedge_delay if waiting else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    start(waiting)
+                    waiting = []
+                    continue
+                # Tasks that finished together are taken in the order they
+                # started, not in the done set's arbitrary order
+                for task in [task for task in running if task in done]:
+                    thinker = running.pop(task)
+                    elapsed = time.monotonic() - started
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.warning(f"{thinker.get_name()} failed in race: {e}")
+                        result = None
+                    if result is None or isinstance(result, FallbackThought):
+                        # A miss costs the others a hedge delay, so count it
+                        self.observe_race(thinker, elapsed + self.hedge_delay)
+                        if result is not None and fallback is None:
+                            fallback = thinker, result
+                        continue
+                    self.observe_race(thinker, elapsed)
+                    return thinker, result
+                if not running and waiting:
+                    start(waiting)
+                    waiting = []
+            return fallback
+        finally:
+            # Losers took at least as long as the race did
+            elapsed = time.monotonic() - started
+            for task, thinker in running.items():
+                task.cancel()
+                self.observe_race(thinker, elapsed)
+
+    def observe_race(self, thinker: Thinker, latency: float):
+        name = thinker.get_name()
+        previous = self.race_latency.get(name, latency)
+        self.race_latency[name] = previous + self.race_latency_weight * (latency - previous)
+
+    def commit(self, thinker: Thinker, thought: str, generation: int) -> bool:
+        # Compare-and-publish: there are no awaits in here, so nothing else can
+        # run on the loop between the generation check and the publish.
+        # A thought built on top of an older generation is dropped, as the
+        # chain has already moved on without it.
+        if generation != self.generation:
+            commits_counter.labels(thinker=thinker.get_name(), result="stale").inc()
+            return False
+        commits_counter.labels(thinker=thinker.get_name(), result="published").inc()
+        self.generation += 1
+        self.publish(Thought(thinker.get_name(), thought, self.generation, room=self.room))
+        # Counted where thoughts are thought, not where they are mirrored
+        self.words.add(thought, thinker.get_name())
+        self.prefetch(thought)
+        return True
+
+    def publish(self, thought: Thought):
+        self.shared_thought = thought.thought
+        self.history.append(thought)
+        self.thoughts.publish(thought)
+        for listener in self.listeners:
+            listener(thought.message)
+
+    def receive(self, thinker: str, thought: str, seq: int, ts: float):
+        # Thoughts produced by another process's cave, e.g. over the bus. The
+        # producer's sequence numbers are kept so they mean the same thing on
+        # every worker.
+        if seq == self.generation:
+            # The latest thought, resent after a bus reconnect
+            return
+        if seq < self.generation:
+            # The producer restarted and its sequence with it
+            self.history.clear()
+        self.generation = seq
+        self.publish(Thought(thinker, thought, seq, ts, room=self.room))
+
+    def catch_up(self, since: int) -> list[Thought]:
+        # Thoughts a client that last saw ``since`` has missed. A number ahead
+        # of ours comes from before a restart, so that client only gets the
+        # latest thought.
+        if since > self.generation:
+            return [self.thoughts.latest] if self.thoughts.latest else []
+        return self.history.since(since)
+
+    def history_frame(self) -> str:
+        # The whole history as one JSON array, built from the already encoded
+        # messages at most once per published thought
+        version = self.thoughts.version
+        if self._history_frame is None or self._history_frame[0] != version:
+            frame = "[" + ",".join(thought.message for thought in self.history.since(-1)) + "]"
+            self._history_frame = (version, frame)
+        return self._history_frame[1]
+
+    def poll_frame(self, since: int | None) -> str:
+        # What a long poll from ``since`` gets: a JSON array of the missed
+        # messages (only the latest without ``since``). Pollers that are
+        # caught up all ask with the same ``since``, so each distinct answer
+        # is built once per published thought.
+        version, frames = self._poll_frames
+        if version != self.thoughts.version:
+            version, frames = self._poll_frames = (self.thoughts.version, {})
+        frame = frames.get(since)
+        if frame is None:
+            latest = self.thoughts.latest
+            missed = self.catch_up(since) if since is not None else [latest] if latest else []
+            frame = "[" + ",".join(thought.message for thought in missed) + "]"
+            if len(frames) < self.max_poll_frames:
+                frames[since] = frame
+        return frame
+
+    def prefetch(self, thought: str):
+        # Warm caches for the thought just published while the thinkers that
+        # will take it sleep: in a race, all of them; otherwise only the next
+        # to wake, as each thought is picked up by just one thinker. Anything
+        # over budget is skipped rather than queued.
+        thinkers = self.thinkers
+        if self.mode == INDEPENDENT:
+            thinkers = sorted(thinkers, key=lambda thinker: self.due.get(thinker.get_name(), 0))
+            thinkers = thinkers[:self.prefetch_next]
+        for thinker in thinkers:
+            if len(self.prefetches) >= self.max_prefetches:
+                logger.debug(f"Prefetch budget exhausted, skipping: {thought}")
+                return
+            task = asyncio.create_task(thinker.prefetch(thought))
+            self.prefetches.add(task)
+            task.add_done_callback(self.prefetches.discard)
 
     async def contemplate(self):
-        await asyncio.gather(*(self.run_thinker(thinker) for thinker in self.thinkers))
+        # Every loop runs under its own supervisor, so one crashing thinker
+        # is restarted on its own instead of taking the others down with it
+        self.liveness = {thinker.get_name(): Liveness(thinker.get_name()) for thinker in self.thinkers}
+        if self.mode == RACE:
+            loops = [(list(self.liveness.values()), self.run_races)]
+        else:
+            loops = [
+                ([self.liveness[thinker.get_name()]], partial(self.run_thinker, thinker, i * self.pacer.interval))
+                for i, thinker in enumerate(self.thinkers)
+            ]
+        self._loops = [(asyncio.create_task(self.supervise(liveness, loop)), liveness) for liveness, loop in loops]
+        try:
+            # stop() cancels idle loops first; that must not cancel busy ones
+            await asyncio.gather(*(task for task, _ in self._loops), return_exceptions=True)
+        finally:
+            for task, _ in self._loops:
+                task.cancel()
 
-    @asynccontextmanager
-    async def get_thought(self):
-        async with self.lock:
-            yield self.shared_message
 
 if __name__ == "__main__":
+    from thinkers.thinker_wikipedia import WikipediaThinker
+    from thinkers.thinker_loc import LOCThinker
+    from thinkers.thinker_openlibrary import OpenLibraryThinker
+
     cave = Cave()
     cave.add_thinker(WikipediaThinker("WikipediaThinker"))
     cave.add_thinker(LOCThinker("LOCThinker"))
     cave.add_thinker(OpenLibraryThinker("OpenLibraryThinker"))
-    asyncio.run(cave.contemplate())
\ No newline at end of file
+
+    async def main():
+        await cave.open()
+        try:
+            await cave.contemplate()
+        finally:
+            await cave.close()
+
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,115 @@
+import hashlib
+import re
+
+from prometheus_client import Counter, Gauge
+
+from cache import LRUCache
+from nlp import NLPService
+
+
+WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z'-]*")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s+")
+ARTICLES = frozenset({"the", "a", "an", "this", "that", "these", "those"})
+
+_memo = LRUCache(maxsize=2048)
+
+extraction_memo_counter = Counter(
+    'extraction_memo_requests_total',
+    'Candidate extraction memo lookups by result',
+    ['result']
+)
+
+extraction_memo_entries_gauge = Gauge(
+    'extraction_memo_entries',
+    'Sentences currently held in the candidate extraction memo'
+)
+extraction_memo_entries_gauge.set_function(lambda: len(_memo))
+
+extraction_memo_hit_ratio_gauge = Gauge(
+    'extraction_memo_hit_ratio',
+    'Share of candidate extractions answered from the memo'
+)
+extraction_memo_hit_ratio_gauge.set_function(_memo.hit_rate)
+
+
+def first_sentence(text: str) -> str:
+    text = WHITESPACE_PATTERN.sub(" ", text).strip()
+    return SENTENCE_END_PATTERN.split(text, maxsplit=1)[0].strip()
+
+
+def _spacy_candidates(doc, thought: str) -> list[str]:
+    tlower = thought.lower()
+    candidates = []
+
+    # First, collect proper nouns (PROPN)
+    for token in doc:
+        if token.pos_ == "PROPN" and token.text.lower() != tlower and not token.text.isdigit() and token.text.isalpha():
+            candidates.append(token.text)
+
+    # Next, collect named entities
+    for ent in doc.ents:
+        if ent.text.lower() != tlower and not ent.text.isdigit() and any(c.isalpha() for c in ent.text):
+            candidates.append(ent.text)
+
+    # Fallback: collect any noun longer than 2 characters
+    if not candidates:
+        for token in doc:
+            if token.pos_ in ("NOUN", "PROPN") and len(token.text) > 2 and token.text.lower() != tlower and not token.text.isdigit() and token.text.isalpha():
+                candidates.append(token.text)
+
+    return candidates
+
+
+def _regex_candidates(sentence: str, thought: str) -> list[str]:
+    tlower = thought.lower()
+    tokens = WORD_PATTERN.findall(sentence)
+    candidates = []
+
+    # Look for capitalized words (proper nouns)
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok.lower() not in ARTICLES and tok[0].isupper() and tok.isalpha():
+            name = tok
+            j = i + 1
+            while j < len(tokens) and tokens[j][0].isupper() and tokens[j].isalpha():
+                name += " " + tokens[j]
+                j += 1
+            if name.lower() != tlower:
+                candidates.append(name)
+            i = j
+        else:
+            i += 1
+
+    # fallback: collect non-article tokens longer than 2
+    if not candidates:
+        for tok in tokens:
+            if tok.lower() not in ARTICLES and len(tok) > 2 and tok.lower() != tlower and tok.isalpha():
+                candidates.append(tok)
+
+    return candidates
+
+
+async def extract_candidates(sentence: str, thought: str, nlp: NLPService) -> list[str]:
+    """Candidate next thoughts found in ``sentence``, excluding ``thought``.
+
+    spaCy proper nouns and entities are preferred, with a regex scan for
+    capitalized words as the fallback. Results are memoized per sentence and
+    thought, so a repeated sentence skips both passes.
+    """
+    key = hashlib.blake2b(f"{thought.lower()}\0{sentence}".encode(), digest_size=16).digest()
+    hit, candidates = _memo.get(key)
+    extraction_memo_counter.labels(result="hit" if hit else "miss").inc()
+    if hit:
+        return candidates
+
+    candidates = []
+    doc = await nlp.parse(sentence)
+    if doc is not None:
+        candidates = _spacy_candidates(doc, thought)
+    if not candidates:
+        candidates = _regex_candidates(sentence, thought)
+
+    _memo.set(key, candidates)
+    return candidates
@@ -0,0 +1,66 @@
+import json
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    # Optional: without it clients cannot ask for ?encoding=msgpack
+    msgpack = None
+
+
+# Websocket frame encodings a client can ask for with ?encoding=
+JSON = "json"
+MSGPACK = "msgpack"
+BINARY = "binary"
+
+ENCODINGS = (JSON, BINARY, MSGPACK) if msgpack is not None else (JSON, BINARY)
+
+# Server-Sent Events: the JSON message as one event, with the seq as its id
+# so EventSource's Last-Event-ID resumes where it left off
+SSE = "sse"
+
+# BINARY frames: thinker id byte, seq as a big-endian uint32, then the
+# thought as UTF-8. Ids index the thinker table sent as a text frame
+# ({"thinkers": [...]}) before the first frame that needs it.
+BINARY_HEADER = struct.Struct(">BI")
+
+
+class ThinkerIds:
+    """Append-only thinker name to id table for BINARY frames."""
+
+    def __init__(self):
+        self.names: list[str] = []
+        self._ids: dict[str, int] = {}
+
+    def get(self, name: str) -> int:
+        thinker_id = self._ids.get(name)
+        if thinker_id is None:
+            if len(self.names) > 255:
+                raise ValueError(f"More than 256 thinkers, cannot give {name} an id")
+            thinker_id = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return thinker_id
+
+    def table(self) -> str:
+        return json.dumps({"thinkers": self.names})
+
+
+thinker_ids = ThinkerIds()
+
+
+def encode(thought, encoding: str) -> str | bytes:
+    if encoding == JSON:
+        return thought.message
+    if encoding == SSE:
+        return f"id: {thought.seq}\ndata: {thought.message}\n\n".encode()
+    if encoding == BINARY:
+        return BINARY_HEADER.pack(thinker_ids.get(thought.thinker), thought.seq) + thought.thought.encode()
+    if encoding == MSGPACK and msgpack is not None:
+        return msgpack.packb({
+            "room": thought.room,
+            "seq": thought.seq,
+            "ts": thought.ts,
+            "thinker": thought.thinker,
+            "thought": thought.thought
+        })
+    raise ValueError(f"Unknown encoding: {encoding}")
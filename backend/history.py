@@ -0,0 +1,43 @@
+from typing import Generic, TypeVar
+
+
+T = TypeVar("T")
+
+
+class RingBuffer(Generic[T]):
+    """Fixed-size buffer of the last ``capacity`` items, oldest overwritten first.
+
+    Items must carry an increasing ``seq`` so ``since()`` can return only the
+    ones a client has not seen.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._items: list[T | None] = [None] * capacity
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, item: T):
+        if not self.capacity:
+            return
+        self._items[self._next] = item
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def clear(self):
+        self._items = [None] * self.capacity
+        self._next = self._count = 0
+
+    def since(self, seq: int) -> list[T]:
+        """Items newer than ``seq``, oldest first."""
+        newer = []
+        for i in range(1, self._count + 1):
+            item = self._items[(self._next - i) % self.capacity]
+            if item.seq <= seq:
+                break
+            newer.append(item)
+        newer.reverse()
+        return newer
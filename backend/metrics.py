@@ -0,0 +1,134 @@
+import asyncio
+import os
+from typing import Hashable
+
+from prometheus_client import CollectorRegistry, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+
+class SpaceSaving:
+    """Space-Saving top-K sketch over a fixed number of monitored keys.
+
+    Counts are upper bounds: a key that replaces the least frequent one
+    inherits its count, which is remembered as that key's error.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._counts: dict[Hashable, int] = {}
+        self._errors: dict[Hashable, int] = {}
+
+    def add(self, key: Hashable, count: int = 1):
+        if key in self._counts:
+            self._counts[key] += count
+        elif len(self._counts) < self.capacity:
+            self._counts[key] = count
+            self._errors[key] = 0
+        else:
+            smallest = min(self._counts, key=self._counts.__getitem__)
+            inherited = self._counts.pop(smallest)
+            del self._errors[smallest]
+            self._counts[key] = inherited + count
+            self._errors[key] = inherited
+
+    def error(self, key: Hashable) -> int:
+        """How much ``key``'s count may overstate its true count."""
+        return self._errors.get(key, 0)
+
+    def top(self, k: int) -> list[tuple[Hashable, int]]:
+        return sorted(self._counts.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class ThoughtWords(Collector):
+    """Counts published thoughts per (word, thinker) with bounded cardinality.
+
+    Per-thinker totals are exact and exported as a counter. The ``k``
+    hottest pairs are sketch estimates, which can drop or vanish when a word
+    is evicted, so they are exported as gauges along with their error bound,
+    and whatever else a thinker said as its ``other`` gauge.
+    """
+
+    OTHER = "other"
+
+    def __init__(self, k: int = 50, capacity: int = 500):
+        self.k = k
+        self.sketch = SpaceSaving(capacity)
+        self.totals: dict[str, int] = {}
+
+    def add(self, word: str, thinker: str):
+        self.sketch.add((word, thinker))
+        self.totals[thinker] = self.totals.get(thinker, 0) + 1
+
+    def collect(self):
+        totals = CounterMetricFamily(
+            'thought_words',
+            'Published thoughts by thinker',
+            labels=['thinker']
+        )
+        for thinker, count in self.totals.items():
+            totals.add_metric([thinker], count)
+        top = GaugeMetricFamily(
+            'thought_words_top',
+            'Estimated published thoughts per word for the hottest words (an upper bound), the rest as "other"',
+            labels=['word', 'thinker']
+        )
+        error = GaugeMetricFamily(
+            'thought_words_top_error',
+            'How much thought_words_top may overstate each count',
+            labels=['word', 'thinker']
+        )
+        other = dict(self.totals)
+        for (word, thinker), count in self.sketch.top(self.k):
+            top.add_metric([word, thinker], count)
+            error.add_metric([word, thinker], self.sketch.error((word, thinker)))
+            other[thinker] -= count
+        # The estimates are upper bounds, so this can undercount; never below 0
+        for thinker, count in other.items():
+            top.add_metric([self.OTHER, thinker], max(count, 0))
+        yield totals
+        yield top
+        yield error
+
+
+class MetricsServer:
+    """Serves a registry in the text format to every connection on a Unix socket."""
+
+    def __init__(self, path: str, registry: CollectorRegistry):
+        self.path = path
+        self.registry = registry
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._connected, path=self.path)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _connected(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            writer.write(generate_latest(self.registry))
+            await writer.drain()
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+
+async def fetch_metrics(path: str, timeout: float = 5) -> bytes:
+    """Reads the metrics another process serves with a ``MetricsServer``."""
+    async def fetch():
+        reader, writer = await asyncio.open_unix_connection(path)
+        try:
+            return await reader.read()
+        finally:
+            writer.close()
+
+    return await asyncio.wait_for(fetch(), timeout)
@@ -0,0 +1,111 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+
+from prometheus_client import Histogram
+
+
+logger = logging.getLogger(__name__)
+
+nlp_batch_size_histogram = Histogram(
+    'nlp_batch_size',
+    'Sentences per spaCy nlp.pipe batch',
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+
+class NLPService:
+    """One spaCy pipeline per process, loaded lazily and run off the event loop.
+
+    Inference runs on a single worker thread: the pipeline is not shared
+    between threads and the returned ``Doc`` objects stay in this process.
+    Sentences arriving within ``batch_window`` seconds of each other, from
+    any thinker, go through ``nlp.pipe`` together, up to ``max_batch_size``.
+    """
+
+    model = "en_core_web_sm"
+    # Thinkers only read POS tags and entities
+    excluded = ["parser", "lemmatizer", "senter"]
+
+    batch_window = 0.005
+    max_batch_size = 32
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlp")
+        self._nlp = None
+        self._loaded = False
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    def _load(self):
+        if not self._loaded:
+            try:
+                import spacy
+                self._nlp = spacy.load(self.model, exclude=self.excluded)
+            except (ImportError, OSError):
+                logger.warning(f"spaCy model '{self.model}' not found. Install it with: python -m spacy download {self.model}")
+            self._loaded = True
+        return self._nlp
+
+    def _parse_batch(self, texts: list[str]) -> list:
+        nlp = self._load()
+        if nlp is None:
+            return [None] * len(texts)
+        return list(nlp.pipe(texts, batch_size=len(texts)))
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        nlp_batch_size_histogram.observe(len(batch))
+        done = self._executor.submit(self._parse_batch, [text for text, _ in batch])
+        loop = asyncio.get_running_loop()
+        done.add_done_callback(lambda done: loop.call_soon_threadsafe(self._resolve, batch, done))
+
+    @staticmethod
+    def _resolve(batch: list[tuple[str, asyncio.Future]], done: Future):
+        error = done.exception()
+        docs = done.result() if error is None else [None] * len(batch)
+        for (_, future), doc in zip(batch, docs):
+            # Callers that were cancelled while waiting are skipped
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(doc)
+
+    @property
+    def available(self) -> bool:
+        """Whether a model is loaded, rather than the regex fallback in use."""
+        return self._nlp is not None
+
+    async def load(self) -> bool:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._load) is not None
+
+    async def parse(self, text: str):
+        """Return the parsed ``Doc``, or ``None`` when no model is installed."""
+        if self._loaded and self._nlp is None:
+            return None
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+
+_service: NLPService | None = None
+
+
+def get_nlp() -> NLPService:
+    global _service
+    if _service is None:
+        _service = NLPService()
+    return _service
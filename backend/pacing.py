@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import math
+import random
+import time
+
+from thinker import Thinker
+
+
+logger = logging.getLogger(__name__)
+
+
+class Pacer:
+    """Paces thinking towards one thought every ``interval`` seconds.
+
+    Time already spent thinking counts towards the pause. With ``idle`` set
+    nothing thinks, and nothing calls upstream, while nobody is watching.
+    A thinker's ``thinks_per_minute`` caps how often it may think at all,
+    across every cave it thinks in.
+    """
+
+    def __init__(self, interval: float = 1.0, jitter: float = 0.25, idle: bool = False):
+        self.interval = interval
+        self.jitter = jitter
+        self.idle = idle
+        self.audience = 0
+        self._watched = asyncio.Event()
+        self.watch(0)
+
+    def watch(self, audience: int):
+        if self.idle and audience == 0 and self.audience > 0:
+            logger.info("Nobody is watching any more, pausing thinkers")
+        self.audience = audience
+        if audience > 0 or not self.idle:
+            self._watched.set()
+        else:
+            self._watched.clear()
+
+    @property
+    def watched(self) -> bool:
+        """Whether thinkers may think now, without waiting for an audience."""
+        return self._watched.is_set()
+
+    async def wait_for_audience(self) -> bool:
+        """Wait until somebody is watching; True if that meant waiting."""
+        if self._watched.is_set():
+            return False
+        await self._watched.wait()
+        return True
+
+    async def spend(self, thinker: Thinker, max_wait: float = math.inf) -> bool:
+        """Take one think from ``thinker``'s budget, waiting up to ``max_wait``."""
+        if thinker.budget is None:
+            return True
+        return await thinker.budget.acquire(max_wait)
+
+    async def pause(self, started: float, interval: float | None = None, rng: random.Random | None = None):
+        """Sleep out the rest of ``interval`` (jittered by ``rng``) since ``started``."""
+        interval = (interval or self.interval) * (rng or random).uniform(1 - self.jitter, 1 + self.jitter)
+        remaining = interval - (time.monotonic() - started)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
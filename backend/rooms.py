@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import re
+from typing import Callable
+
+from prometheus_client import Gauge
+
+from cave import Cave, DEFAULT_ROOM
+from store import ThoughtStore
+from thinker import Thinker
+from upstream import close_upstreams
+
+
+logger = logging.getLogger(__name__)
+
+ROOM_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+audience_gauge = Gauge(
+    'cave_audience',
+    'Subscribers the caves are thinking for, over all rooms (in multi-worker mode, the producer sees all workers)'
+)
+
+rooms_gauge = Gauge(
+    'cave_rooms',
+    'Rooms currently held in memory'
+)
+
+
+class Rooms:
+    """One ``Cave`` per room, created on first use.
+
+    Every cave shares the same thinkers, and through them the upstream
+    sessions, rate limiters, NLP service, response cache and thought store.
+    Once started, each room runs its own chain; its pacer keeps the
+    thinkers idle while the room has no subscribers. When ``max_rooms`` is
+    reached, the least recently used room nobody is watching is dropped to
+    make space.
+    """
+
+    def __init__(self, make_cave: Callable[[str], Cave], thinkers: list[Thinker] | None = None,
+                 store: ThoughtStore | None = None, max_rooms: int = 500):
+        self.make_cave = make_cave
+        self.thinkers = thinkers or []
+        self.store = store
+        self.max_rooms = max_rooms
+        # Called with every newly created cave, e.g. to wire it to a bus
+        self.on_cave: list[Callable[[Cave], None]] = []
+        self._caves: dict[str, Cave] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._running = False
+
+    def __len__(self) -> int:
+        return len(self._caves)
+
+    def __iter__(self):
+        return iter(self._caves.values())
+
+    def audience(self) -> int:
+        return sum(cave.pacer.audience for cave in self._caves.values())
+
+    def get(self, room: str, create: bool = True) -> Cave | None:
+        """The cave for ``room``, or None if it cannot be (or was not) created."""
+        cave = self._caves.pop(room, None)
+        if cave is None:
+            if not create or not ROOM_PATTERN.fullmatch(room) or not self._make_space():
+                return None
+            cave = self.make_cave(room)
+            for hook in self.on_cave:
+                hook(cave)
+            if self._running:
+                self._start(room, cave)
+        # Re-inserted so the dict stays in least recently used order
+        self._caves[room] = cave
+        rooms_gauge.set(len(self._caves))
+        return cave
+
+    def _make_space(self) -> bool:
+        if len(self._caves) < self.max_rooms:
+            return True
+        for room, cave in self._caves.items():
+            if room != DEFAULT_ROOM and cave.pacer.audience == 0 and not len(cave.thoughts):
+                self._drop(room)
+                return True
+        logger.warning(f"All {self.max_rooms} rooms are in use")
+        return False
+
+    def _drop(self, room: str):
+        logger.debug(f"Dropping idle room {room}")
+        self._caves.pop(room)
+        task = self._tasks.pop(room, None)
+        if task is not None:
+            task.cancel()
+
+    def _start(self, room: str, cave: Cave):
+        self._tasks[room] = asyncio.create_task(cave.contemplate())
+
+    def start(self):
+        """Start thinking in every room, now and as rooms are created."""
+        self._running = True
+        for room, cave in self._caves.items():
+            self._start(room, cave)
+
+    async def stop(self, timeout: float = 0):
+        """Stop thinking in every room, giving thoughts in flight up to ``timeout``."""
+        self._running = False
+        await asyncio.gather(*(cave.stop(timeout) for cave in self._caves.values()))
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    async def close(self):
+        await self.stop()
+        await close_upstreams()
+        await asyncio.gather(*(thinker.close() for thinker in self.thinkers))
+        if self.store is not None:
+            await self.store.close()
+
+    def health(self) -> dict[str, dict[str, dict]]:
+        """Liveness of every thinker loop, by room."""
+        return {room: cave.health() for room, cave in self._caves.items() if cave.liveness}
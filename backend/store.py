@@ -0,0 +1,128 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class StoredThought(NamedTuple):
+    candidates: list[str]
+    sentence: str
+    updated: float
+
+
+class ThoughtStore:
+    """SQLite-backed ``(thinker, thought) -> candidates`` store.
+
+    The ``max_entries`` most recently used rows are kept in memory; ``load()``
+    fills it with the most recently updated ones. A lookup that misses memory
+    falls back to a read from SQLite, but only once rows have been left out
+    or evicted. Reads and writes run on a single background thread, which
+    also owns the connection.
+    """
+
+    def __init__(self, path: str, revalidate_after: float = 7 * 24 * 3600, max_entries: int = 50_000):
+        self.path = path
+        self.revalidate_after = revalidate_after
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], StoredThought] = OrderedDict()
+        # Whether SQLite may hold rows that are not in memory
+        self._partial = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thought-store")
+        self._db: sqlite3.Connection | None = None
+
+    def _load(self) -> tuple[list[tuple[tuple[str, str], StoredThought]], int]:
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS thoughts ("
+            "thinker TEXT NOT NULL, thought TEXT NOT NULL, candidates TEXT NOT NULL, "
+            "sentence TEXT NOT NULL, updated REAL NOT NULL, PRIMARY KEY (thinker, thought))"
+        )
+        self._db.commit()
+        total = self._db.execute("SELECT COUNT(*) FROM thoughts").fetchone()[0]
+        rows = self._db.execute(
+            "SELECT thinker, thought, candidates, sentence, updated FROM thoughts "
+            "ORDER BY updated DESC LIMIT ?", (self.max_entries,)
+        )
+        entries = [
+            ((thinker, thought), StoredThought(json.loads(candidates), sentence, updated))
+            for thinker, thought, candidates, sentence, updated in rows
+        ]
+        return entries, total
+
+    def _read(self, thinker: str, thought: str) -> StoredThought | None:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT candidates, sentence, updated FROM thoughts WHERE thinker = ? AND thought = ?",
+            (thinker, thought)
+        ).fetchone()
+        return StoredThought(json.loads(row[0]), row[1], row[2]) if row else None
+
+    def _write(self, thinker: str, thought: str, entry: StoredThought):
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO thoughts VALUES (?, ?, ?, ?, ?)",
+                (thinker, thought, json.dumps(entry.candidates), entry.sentence, entry.updated)
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing thought store {self.path}: {e}")
+
+    async def load(self):
+        loop = asyncio.get_running_loop()
+        entries, total = await loop.run_in_executor(self._executor, self._load)
+        # Rows come newest first and go in ahead of anything remembered while
+        # loading (which is newer than its disk copy), so the oldest rows are
+        # the first to be evicted
+        for key, entry in entries:
+            if key not in self._entries:
+                self._entries[key] = entry
+                self._entries.move_to_end(key, last=False)
+        self._partial = total > len(entries)
+        self._evict()
+        logger.info(f"Loaded {len(entries)} of {total} stored thoughts from {self.path}")
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        if self._db is not None:
+            await loop.run_in_executor(self._executor, self._db.close)
+            self._db = None
+        self._executor.shutdown(wait=False)
+
+    async def recall(self, thinker: str, thought: str) -> StoredThought | None:
+        key = (thinker, thought.strip())
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        if not self._partial or self._db is None:
+            return None
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(self._executor, self._read, *key)
+        if entry is not None and key not in self._entries:
+            self._entries[key] = entry
+            self._evict()
+        return entry
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._partial = True
+
+    def is_stale(self, entry: StoredThought) -> bool:
+        return time.time() - entry.updated > self.revalidate_after
+
+    def remember(self, thinker: str, thought: str, candidates: list[str], sentence: str):
+        entry = StoredThought(list(candidates), sentence, time.time())
+        self._entries[(thinker, thought.strip())] = entry
+        self._entries.move_to_end((thinker, thought.strip()))
+        self._evict()
+        if self._db is not None:
+            self._executor.submit(self._write, thinker, thought.strip(), entry)
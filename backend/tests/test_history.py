@@ -0,0 +1,42 @@
+from typing import NamedTuple
+
+from history import RingBuffer
+
+
+class Item(NamedTuple):
+    seq: int
+
+
+def filled(capacity: int, count: int) -> RingBuffer[Item]:
+    buffer = RingBuffer(capacity)
+    for seq in range(1, count + 1):
+        buffer.append(Item(seq))
+    return buffer
+
+
+def test_wraparound_keeps_the_newest_items():
+    buffer = filled(3, 5)
+    assert len(buffer) == 3
+    assert buffer.since(0) == [Item(3), Item(4), Item(5)]
+
+
+def test_since_returns_only_newer_items():
+    buffer = filled(3, 5)
+    assert buffer.since(3) == [Item(4), Item(5)]
+    assert buffer.since(5) == []
+
+
+def test_since_beyond_capacity_returns_everything_kept():
+    # Seqs 1 and 2 were overwritten; a client that last saw 1 gets what is left
+    buffer = filled(3, 5)
+    assert buffer.since(1) == [Item(3), Item(4), Item(5)]
+
+
+def test_clear_and_zero_capacity():
+    buffer = filled(3, 5)
+    buffer.clear()
+    assert len(buffer) == 0
+    assert buffer.since(0) == []
+    empty = filled(0, 2)
+    assert len(empty) == 0
+    assert empty.since(0) == []
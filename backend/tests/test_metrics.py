@@ -0,0 +1,46 @@
+from prometheus_client import CollectorRegistry
+
+from metrics import SpaceSaving, ThoughtWords
+
+
+def test_space_saving_counts_exactly_until_full():
+    sketch = SpaceSaving(3)
+    for key in "aabbbc":
+        sketch.add(key)
+    assert sketch.top(3) == [("b", 3), ("a", 2), ("c", 1)]
+    assert sketch.error("a") == 0
+
+
+def test_space_saving_evicts_the_least_frequent_key():
+    sketch = SpaceSaving(2)
+    for key in "aaab":
+        sketch.add(key)
+    # "c" replaces "b" and inherits its count as its error
+    sketch.add("c")
+    assert dict(sketch.top(2)) == {"a": 3, "c": 2}
+    assert sketch.error("c") == 1
+    assert sketch.error("b") == 0
+    # A heavy hitter is never evicted in favour of a newcomer
+    sketch.add("d")
+    assert dict(sketch.top(2)) == {"a": 3, "d": 3}
+
+
+def test_thought_words_totals_stay_monotonic_under_eviction():
+    words = ThoughtWords(k=2, capacity=3)
+    registry = CollectorRegistry()
+    registry.register(words)
+    previous = 0
+    for word in "abcdefg":
+        words.add(word, "T")
+        total = registry.get_sample_value("thought_words_total", {"thinker": "T"})
+        assert total == previous + 1
+        previous = total
+    top = {
+        sample.labels["word"]: sample.value
+        for family in registry.collect() if family.name == "thought_words_top"
+        for sample in family.samples
+    }
+    assert len(top) == 3
+    # Everything outside the top two: 7 words minus their estimates of 3 and 2
+    assert top["other"] == 2
+    assert top["other"] == previous - sum(count for word, count in top.items() if word != "other")
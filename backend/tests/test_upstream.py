@@ -0,0 +1,107 @@
+import asyncio
+import math
+
+import upstream
+from upstream import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, TokenBucket
+
+
+class FrozenTime:
+    def __init__(self, now: float = 0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def test_token_bucket_reserves_tokens_in_call_order(monkeypatch):
+    monkeypatch.setattr(upstream, "time", FrozenTime())
+    bucket = TokenBucket(rate=100, capacity=1)
+
+    async def main():
+        assert await bucket.acquire(0)
+        # The next tokens free up 10ms apart; each caller reserves its slot
+        assert await bucket.acquire(0.015)
+        # Third in line would wait 20ms: refused, and nothing is reserved...
+        assert not await bucket.acquire(0.015)
+        # ...so the next caller still gets that slot
+        assert await bucket.acquire(0.025)
+
+    asyncio.run(main())
+
+
+def test_token_bucket_waiters_finish_in_call_order():
+    bucket = TokenBucket(rate=100, capacity=1)
+    finished = []
+
+    async def take(i: int):
+        assert await bucket.acquire(math.inf)
+        finished.append(i)
+
+    async def main():
+        await asyncio.gather(*(take(i) for i in range(4)))
+
+    asyncio.run(main())
+    assert finished == [0, 1, 2, 3]
+
+
+def test_circuit_breaker_trips_probes_and_closes():
+    breaker = CircuitBreaker("breaker.test", failure_threshold=2, reset_timeout=0.01)
+    probes = []
+
+    async def probe() -> bool:
+        probes.append(breaker.state)
+        # Unhealthy on the first probe, healthy on the second
+        return len(probes) > 1
+
+    async def main():
+        breaker.record_failure(probe)
+        assert breaker.allow()
+        breaker.record_failure(probe)
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        async with asyncio.timeout(1):
+            while breaker.state != CLOSED:
+                await asyncio.sleep(0.005)
+
+    asyncio.run(main())
+    assert probes == [HALF_OPEN, HALF_OPEN]
+    assert breaker.allow()
+    assert breaker.failures == 0
+
+
+def test_circuit_breaker_trips_at_once_on_retry_after():
+    breaker = CircuitBreaker("retry-after.test", failure_threshold=5)
+
+    async def probe() -> bool:
+        return True
+
+    async def main():
+        breaker.record_failure(probe, retry_after=0.01)
+        assert breaker.state == OPEN
+        async with asyncio.timeout(1):
+            while breaker.state != CLOSED:
+                await asyncio.sleep(0.005)
+
+    asyncio.run(main())
+
+
+def test_circuit_breaker_close_stops_probing():
+    breaker = CircuitBreaker("close.test", failure_threshold=1, reset_timeout=0.01)
+    probes = []
+
+    async def probe() -> bool:
+        probes.append(breaker.state)
+        return False
+
+    async def main():
+        breaker.record_failure(probe)
+        async with asyncio.timeout(1):
+            while not probes:
+                await asyncio.sleep(0.005)
+        await breaker.close()
+        probed = len(probes)
+        await asyncio.sleep(0.05)
+        assert len(probes) == probed
+
+    asyncio.run(main())
+    assert breaker.state == OPEN
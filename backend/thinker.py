@@ -1,21 +1,366 @@
+import asyncio
+from contextlib import nullcontext
+from contextvars import ContextVar
+import logging
+import random
+from types import MappingProxyType
+from typing import Any, Callable, Mapping
+from urllib.parse import urlsplit
+from prometheus_client import Counter, Histogram
 
-from abc import ABC, abstractmethod
-import spacy
+from cache import ResponseCache, cache_key, cache_requests_counter, get_cache
+from extraction import WORD_PATTERN, extract_candidates, first_sentence
+from nlp import get_nlp
+from store import ThoughtStore
+from transport import HTTPStatusError, LiveTransport, Response, Transport, TransportError
+from upstream import SourceUnavailable, TokenBucket, get_upstream, upstream_rejections_counter
 
 
-class Thinker(ABC):
-    def __init__(self, name: str):
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            self.nlp = None
+logger = logging.getLogger(__name__)
+
+COMMON_NOUNS = ("idea", "concept", "thought", "question", "answer", "theory", "subject", "topic", "matter", "issue")
+
+thinker_stage_histogram = Histogram(
+    'thinker_stage_seconds',
+    'Time spent in each thinker pipeline stage',
+    ['thinker', 'stage']
+)
+
+thinker_fallbacks_counter = Counter(
+    'thinker_fallbacks_total',
+    'Thoughts that fell back to a random common noun, by reason',
+    ['thinker', 'reason']
+)
+
+
+# Set while the pipeline runs only to warm caches (a prefetch or a stale
+# revalidation), so that work stays out of the stage and fallback metrics
+# and leaves the thinker's random sequence alone
+prefetching: ContextVar[bool] = ContextVar("prefetching", default=False)
+
+
+class FallbackThought(str):
+    """A random common noun, returned when a source had nothing better."""
+
+
+class Thinker:
+    """Turns a thought into the next one using an upstream search API.
+
+    Subclasses declare their source: the search endpoint below ``base_url``,
+    its fixed parameters and the one carrying the query, the keys leading to
+    the result list in the response and the result fields tried in order for
+    the text to extract candidates from. ``choose()`` and ``describe()`` can
+    be overridden where a source needs extra requests. A subclass that
+    neither declares a source nor overrides the pipeline is a TypeError.
+    """
+
+    user_agent = "Thinker/1.0 (https://github.com/your-repo)"
+    # Upstream origin, overridable per instance (e.g. to point at a stub)
+    base_url = ""
+
+    search_path = ""
+    search_params: Mapping[str, Any] = MappingProxyType({})
+    query_param = ""
+    results_path: tuple[str, ...] = ()
+    extract_fields: tuple[str, ...] = ()
+
+    # Connection pool tuning for the long-lived session
+    connection_limit = 16
+    connection_limit_per_host = 4
+    keepalive_timeout = 30
+    dns_cache_ttl = 300
+    request_timeout = 10
+    # Longest a request may wait on its host's rate limiter before giving up
+    rate_limit_wait = 2
+
+    # Cap on think() calls per minute for this source, 0 for none
+    thinks_per_minute = 0
+
+    # Response cache lifetimes, in seconds
+    cache_ttl = 6 * 3600
+    negative_cache_ttl = 600
+
+    def __init__(self, name: str, cache: ResponseCache | None = None, base_url: str | None = None,
+                 transport: Transport | None = None):
+        if not (self.search_path and self.query_param) and all(
+            getattr(type(self), method) is getattr(Thinker, method) for method in ("think", "ponder", "search")
+        ):
+            raise TypeError(f"{type(self).__name__} declares no source: set search_path and query_param")
+        if base_url:
+            self.base_url = base_url.rstrip("/")
+        self.nlp = get_nlp()
+        self.cache = cache or get_cache()
+        self.store: ThoughtStore | None = None
+        self.__revalidating: dict[str, asyncio.Task] = {}
+        self.__inflight: dict[tuple, asyncio.Future] = {}
+        self.__budget: TokenBucket | None = None
         self.__name = name
         self.__current_thought = ""
         self.__next_thought = ""
+        # Picks among candidates; seeded for replays that take the same path
+        self.rng = random.Random()
+        self.transport = transport or self.live_transport()
 
-    @abstractmethod
     async def think(self, thought: str) -> str:
-        raise NotImplementedError
+        if self.store is not None and thought and thought.strip():
+            entry = await self.store.recall(self.get_name(), thought)
+            if entry is not None:
+                if self.store.is_stale(entry):
+                    self.__revalidate(thought)
+                result = self.pick(entry.candidates)
+                logger.debug(f"Recalled noun: {result} from {len(entry.candidates)} stored candidates")
+                return result
+        return await self.ponder(thought)
+
+    async def ponder(self, thought: str) -> str:
+        """Work out the next thought from the upstream source."""
+        logger.debug(f"{self.get_name()} received thought: {thought}")
+        if not thought or not thought.strip():
+            return self.fallback("empty_thought")
+
+        query = thought.strip()
+        try:
+            results = await self.search(query)
+        except Exception as e:
+            logger.error(f"{self.get_name()} search failed: {e}")
+            return self.fallback("search_error")
+
+        item = await self.choose(query, results)
+        title = item.get("title") if item else None
+        if not title:
+            return self.fallback("no_title")
+
+        extract = await self.describe(title, item)
+        if not extract:
+            return self.fallback("no_extract")
+
+        sentence = first_sentence(extract)
+        with self.timed("nlp"):
+            candidates = await extract_candidates(sentence, thought, self.nlp)
+        if candidates:
+            self.remember(thought, candidates, sentence)
+            result = self.pick(candidates)
+            logger.debug(f"Extracted noun: {result} from {len(candidates)} candidates")
+            return result
+
+        # Last resort: the first word of the title
+        title_tokens = WORD_PATTERN.findall(title)
+        if title_tokens and title_tokens[0].lower() != thought.lower():
+            self.remember(thought, title_tokens[:1], sentence)
+            logger.debug(f"Fallback title token: {title_tokens[0]}")
+            return title_tokens[0]
+
+        return self.fallback("no_candidates")
+
+    def results(self, response: Any) -> list[dict]:
+        for key in self.results_path:
+            if not isinstance(response, dict):
+                return []
+            response = response.get(key)
+        return response or []
+
+    async def search(self, query: str, stage: str = "search") -> list[dict]:
+        response = await self.fetch_json(
+            f"{self.base_url}{self.search_path}",
+            {**self.search_params, self.query_param: query},
+            empty=lambda js: not self.results(js),
+            stage=stage
+        )
+        return self.results(response)
+
+    async def choose(self, query: str, results: list[dict]) -> dict | None:
+        """The result to follow: a title match if there is one, else the first."""
+        qlower = query.lower()
+        for result in results:
+            title = result.get("title", "")
+            if title and qlower in title.lower():
+                return result
+        return results[0] if results else None
+
+    async def describe(self, title: str, item: dict) -> str:
+        """Text about ``item`` to pick the next thought from."""
+        for field in self.extract_fields:
+            value = item.get(field)
+            if isinstance(value, list):
+                value = " ".join(value)
+            if value:
+                return value
+        return title
+
+    async def prefetch(self, thought: str):
+        """Warm the response cache and extraction memo for ``thought``.
+
+        The result is thrown away; a later ``think()`` on the same thought
+        then only has to pick a candidate.
+        """
+        if not thought or not thought.strip():
+            return
+        if self.store is not None and await self.store.recall(self.get_name(), thought) is not None:
+            return
+        token = prefetching.set(True)
+        try:
+            await self.ponder(thought)
+        finally:
+            prefetching.reset(token)
+
+    def seed(self, seed: str):
+        """Make this thinker's choices repeat for the same seed and thoughts."""
+        self.rng.seed(f"{seed}:{self.get_name()}")
+
+    def pick(self, options):
+        if prefetching.get():
+            return options[0]
+        return self.rng.choice(options)
+
+    def fallback(self, reason: str) -> FallbackThought:
+        if not prefetching.get():
+            thinker_fallbacks_counter.labels(thinker=self.get_name(), reason=reason).inc()
+        result = FallbackThought(self.pick(COMMON_NOUNS))
+        logger.debug(f"Generated random noun: {result}")
+        return result
+
+    def timed(self, stage: str):
+        if prefetching.get():
+            return nullcontext()
+        return thinker_stage_histogram.labels(thinker=self.get_name(), stage=stage).time()
+
+    def remember(self, thought: str, candidates: list[str], sentence: str):
+        if self.store is not None:
+            self.store.remember(self.get_name(), thought, candidates, sentence)
+
+    def __revalidate(self, thought: str):
+        key = thought.strip()
+        if key in self.__revalidating:
+            return
+        token = prefetching.set(True)
+        try:
+            task = asyncio.create_task(self.ponder(thought))
+        finally:
+            prefetching.reset(token)
+        self.__revalidating[key] = task
+        task.add_done_callback(lambda _: self.__revalidating.pop(key, None))
+
+    @property
+    def budget(self) -> TokenBucket | None:
+        """The ``thinks_per_minute`` allowance, shared by every room this thinker is in."""
+        if self.__budget is None and self.thinks_per_minute:
+            self.__budget = TokenBucket(self.thinks_per_minute / 60, 1)
+        return self.__budget
+
+    def live_transport(self) -> LiveTransport:
+        return LiveTransport(
+            self.user_agent,
+            limit=self.connection_limit,
+            limit_per_host=self.connection_limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            dns_cache_ttl=self.dns_cache_ttl,
+            timeout=self.request_timeout,
+        )
+
+    async def open(self):
+        await self.transport.open()
+
+    async def close(self):
+        # Revalidations and shared fetches run on their own; stop them before
+        # the session they use goes away
+        tasks = [*self.__revalidating.values(), *self.__inflight.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.transport.close()
+
+    async def fetch_json(self, url: str, params: dict | None = None,
+                         empty: Callable[[Any], bool] | None = None, stage: str = "fetch") -> Any:
+        """GET ``url`` as JSON through the response cache.
+
+        Returns ``None`` for a 404. Missing and ``empty`` responses are cached
+        for ``negative_cache_ttl`` only; other error statuses raise and are
+        not cached. When the host's circuit is open or its rate limit is
+        exhausted, an expired cache entry is served if there is one and
+        ``SourceUnavailable`` is raised otherwise. The call is timed as
+        ``stage`` in ``thinker_stage_seconds``.
+        """
+        with self.timed(stage):
+            return await self.__cached_json(url, params, empty)
+
+    async def __cached_json(self, url: str, params: dict | None,
+                            empty: Callable[[Any], bool] | None) -> Any:
+        key = cache_key(url, params)
+        hit, entry = await self.cache.get(key)
+        if hit:
+            negative, value = entry
+            cache_requests_counter.labels(
+                source=self.get_name(),
+                result="negative_hit" if negative else "hit"
+            ).inc()
+            return value
+        cache_requests_counter.labels(source=self.get_name(), result="miss").inc()
+
+        # Callers asking for a response that is already on its way (e.g. from
+        # a prefetch) share that request instead of issuing another one
+        inflight = self.__inflight.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self.__fetch_json(key, url, params, empty))
+            self.__inflight[key] = inflight
+            inflight.add_done_callback(lambda f: self.__settled(key, f))
+        return await asyncio.shield(inflight)
+
+    def __settled(self, key: tuple, inflight: asyncio.Future):
+        self.__inflight.pop(key, None)
+        # Everyone waiting on it may have been cancelled (e.g. a lost race);
+        # mark a failure as seen so it is not reported as never retrieved
+        if not inflight.cancelled():
+            inflight.exception()
+
+    async def __fetch_json(self, key: tuple, url: str, params: dict | None,
+                           empty: Callable[[Any], bool] | None) -> Any:
+        if not self.transport.guarded:
+            response = await self.transport.get_json(url, params)
+            return await self.__settle_response(key, url, response, empty)
+
+        parts = urlsplit(url)
+        upstream = get_upstream(parts.hostname)
+        if not upstream.breaker.allow():
+            reason = "circuit_open"
+        elif not await upstream.limiter.acquire(self.rate_limit_wait):
+            reason = "rate_limited"
+        else:
+            reason = None
+        if reason is not None:
+            upstream_rejections_counter.labels(host=upstream.host, reason=reason).inc()
+            hit, entry = await self.cache.get(key, stale=True)
+            if hit:
+                return entry[1]
+            raise SourceUnavailable(f"{upstream.host} unavailable: {reason}")
+
+        probe = lambda: self.transport.probe(f"{parts.scheme}://{parts.netloc}/")
+        try:
+            response = await self.transport.get_json(url, params)
+        except TransportError:
+            upstream.breaker.record_failure(probe)
+            raise
+        if response.status == 429 or response.status >= 500:
+            retry_after = response.retry_after or ""
+            upstream.breaker.record_failure(
+                probe, float(retry_after) if retry_after.isdigit() else None
+            )
+        else:
+            upstream.breaker.record_success()
+        return await self.__settle_response(key, url, response, empty)
+
+    async def __settle_response(self, key: tuple, url: str, response: Response,
+                                empty: Callable[[Any], bool] | None) -> Any:
+        if response.status == 404:
+            value = None
+        elif response.status >= 400:
+            raise HTTPStatusError(url, response.status)
+        else:
+            value = response.body
+
+        negative = value is None or (empty is not None and empty(value))
+        ttl = self.negative_cache_ttl if negative else self.cache_ttl
+        await self.cache.set(key, (negative, value), ttl)
+        return value
 
     def set_current_thought(self, thought: str):
         self.__current_thought = thought
@@ -24,4 +369,4 @@ class Thinker(ABC):
         return self.__next_thought
 
     def get_name(self) -> str:
-        return self.__name
\ No newline at end of file
+        return self.__name
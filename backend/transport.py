@@ -0,0 +1,248 @@
+import asyncio
+from abc import ABC, abstractmethod
+import gzip
+import json
+import logging
+import os
+import time
+from typing import Any, NamedTuple
+
+from cache import cache_key
+
+
+logger = logging.getLogger(__name__)
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+
+
+class TransportError(Exception):
+    """The request did not complete: connection failure or timeout."""
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, url: str, status: int):
+        super().__init__(f"{status} from {url}")
+        self.status = status
+
+
+class Response(NamedTuple):
+    status: int
+    # Parsed JSON body; None for 404s and upstream errors
+    body: Any
+    retry_after: str | None = None
+
+
+class Transport(ABC):
+    """How a thinker's GETs reach an upstream (or a recording of one)."""
+
+    # Whether calls go to a real host and so through its rate limiter and
+    # circuit breaker
+    guarded = True
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def get_json(self, url: str, params: dict | None = None) -> Response:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def probe(self, url: str) -> bool:
+        """Whether the host at ``url`` looks healthy again."""
+        raise NotImplementedError
+
+
+class LiveTransport(Transport):
+    """Pooled aiohttp session against the real upstream."""
+
+    def __init__(self, user_agent: str, limit: int = 16, limit_per_host: int = 4,
+                 keepalive_timeout: float = 30, dns_cache_ttl: int = 300, timeout: float = 10):
+        self.user_agent = user_agent
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = timeout
+        self._session = None
+        # Set by close(), so stragglers do not open a session nobody closes
+        self._closed = False
+
+    async def open(self):
+        self._closed = False
+        if self._session is not None and not self._session.closed:
+            return
+        # Imported here rather than at module level: aiohttp is most of the
+        # backend's import time and only needed once thinking starts
+        import aiohttp
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"User-Agent": self.user_agent},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    async def close(self):
+        self._closed = True
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_json(self, url: str, params: dict | None = None) -> Response:
+        import aiohttp
+        if self._closed:
+            raise TransportError(f"{url}: transport is closed")
+        # Normally opened at server start; opened lazily for standalone use
+        await self.open()
+        try:
+            async with self._session.get(url, params=params) as resp:
+                body = await resp.json() if resp.status < 400 else None
+                return Response(resp.status, body, resp.headers.get("Retry-After"))
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            raise TransportError(f"{url}: {e!r}") from e
+
+    async def probe(self, url: str) -> bool:
+        if self._closed:
+            raise TransportError(f"{url}: transport is closed")
+        await self.open()
+        async with self._session.head(url, allow_redirects=True) as resp:
+            return resp.status < 500 and resp.status != 429
+
+
+def read_header(path: str) -> dict:
+    """The header a corpus starts with (e.g. its thinker seed), if any."""
+    opener = gzip.open if path.endswith(".gz") else open
+    try:
+        with opener(path, "rt", encoding="utf-8") as f:
+            record = json.loads(f.readline() or "{}")
+    except FileNotFoundError:
+        return {}
+    return {} if "url" in record else record
+
+
+class Recorder:
+    """Appends request/response pairs to a JSON Lines corpus (gzipped for .gz).
+
+    A new corpus starts with ``header``, a record without a ``url``.
+    """
+
+    def __init__(self, path: str, header: dict | None = None):
+        self.path = path
+        self.header = header
+        self._file = None
+
+    def write(self, record: dict):
+        if self._file is None:
+            opener = gzip.open if self.path.endswith(".gz") else open
+            new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            self._file = opener(self.path, "at", encoding="utf-8")
+            if self.header and new:
+                self._file.write(json.dumps(self.header, separators=(",", ":")) + "\n")
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RecordingTransport(Transport):
+    """Passes requests through to ``inner`` and records every exchange."""
+
+    def __init__(self, inner: Transport, recorder: Recorder):
+        self.inner = inner
+        self.recorder = recorder
+
+    async def open(self):
+        await self.inner.open()
+
+    async def close(self):
+        await self.inner.close()
+        self.recorder.close()
+
+    async def get_json(self, url: str, params: dict | None = None) -> Response:
+        started = time.monotonic()
+        record = {"url": url, "params": params}
+        try:
+            response = await self.inner.get_json(url, params)
+        except TransportError as e:
+            record.update(error=str(e), latency=round(time.monotonic() - started, 4))
+            self.recorder.write(record)
+            raise
+        record.update(
+            status=response.status, body=response.body, retry_after=response.retry_after,
+            latency=round(time.monotonic() - started, 4)
+        )
+        self.recorder.write(record)
+        return response
+
+    async def probe(self, url: str) -> bool:
+        return await self.inner.probe(url)
+
+
+class ReplayTransport(Transport):
+    """Serves a recorded corpus from memory, without any network.
+
+    Each response is delayed by its recorded latency divided by ``speed``;
+    0 replays as fast as possible. A request recorded more than once gets
+    its responses in recorded order, round robin. A request that was never
+    recorded gets a 404.
+    """
+
+    guarded = False
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        self.speed = speed
+        self.misses = 0
+        self._responses: dict[tuple, list[dict]] | None = None
+        self._loading: asyncio.Future | None = None
+        self._next: dict[tuple, int] = {}
+
+    def _load(self) -> dict[tuple, list[dict]]:
+        opener = gzip.open if self.path.endswith(".gz") else open
+        responses: dict[tuple, list[dict]] = {}
+        with opener(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if "url" not in record:
+                    continue
+                responses.setdefault(cache_key(record["url"], record["params"]), []).append(record)
+        logger.info(f"Replaying {sum(map(len, responses.values()))} responses from {self.path}")
+        return responses
+
+    async def open(self):
+        # Shared by every thinker, so only the first open() reads the corpus
+        if self._loading is None:
+            self._loading = asyncio.get_running_loop().run_in_executor(None, self._load)
+        self._responses = await self._loading
+
+    async def get_json(self, url: str, params: dict | None = None) -> Response:
+        await self.open()
+        key = cache_key(url, params)
+        records = self._responses.get(key)
+        if not records:
+            self.misses += 1
+            logger.debug(f"No recorded response for {url} {params}")
+            return Response(404, None)
+
+        i = self._next.get(key, 0)
+        self._next[key] = (i + 1) % len(records)
+        record = records[i]
+        if self.speed > 0:
+            await asyncio.sleep(record["latency"] / self.speed)
+        if "error" in record:
+            raise TransportError(record["error"])
+        return Response(record["status"], record["body"], record["retry_after"])
+
+    async def probe(self, url: str) -> bool:
+        return True
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from prometheus_client import Counter, Gauge
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+STATE_NAMES = {CLOSED: "closed", HALF_OPEN: "half-open", OPEN: "open"}
+
+circuit_state_gauge = Gauge(
+    'upstream_circuit_state',
+    'Circuit breaker state per upstream host (0 closed, 1 half-open, 2 open)',
+    ['host']
+)
+
+upstream_rejections_counter = Counter(
+    'upstream_rejections_total',
+    'Upstream requests skipped by the rate limiter or an open circuit',
+    ['host', 'reason']
+)
+
+
+class SourceUnavailable(Exception):
+    """Raised instead of calling an upstream that is tripped or over its rate."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self, max_wait: float) -> bool:
+        """Take a token, waiting at most ``max_wait`` seconds for one to free up."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0
+        if wait > max_wait:
+            return False
+        # Reserve the token now so later callers queue up behind this one
+        self._tokens -= 1
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+
+class CircuitBreaker:
+    """Trips after ``failure_threshold`` consecutive failures.
+
+    While open, a background task probes the host with a growing cooldown
+    and closes the circuit again on the first successful probe.
+    """
+
+    def __init__(self, host: str, failure_threshold: int = 5,
+                 reset_timeout: float = 15, max_reset_timeout: float = 300):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.failures = 0
+        self._state = CLOSED
+        self._probe_task: asyncio.Task | None = None
+        circuit_state_gauge.labels(host=host).set(CLOSED)
+
+    @property
+    def state(self) -> int:
+        return self._state
+
+    def _set_state(self, state: int):
+        if state != self._state:
+            logger.warning(f"Circuit for {self.host} is now {STATE_NAMES[state]}")
+        self._state = state
+        circuit_state_gauge.labels(host=self.host).set(state)
+
+    def allow(self) -> bool:
+        return self._state == CLOSED
+
+    def record_success(self):
+        self.failures = 0
+        self._set_state(CLOSED)
+
+    def record_failure(self, probe: Callable[[], Awaitable[bool]], retry_after: float | None = None):
+        self.failures += 1
+        if retry_after is None and self.failures < self.failure_threshold:
+            return
+        if self._state == CLOSED:
+            self._set_state(OPEN)
+            self._probe_task = asyncio.create_task(self._recover(probe, retry_after or self.reset_timeout))
+
+    async def close(self):
+        """Stop probing; the state is left as it is."""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+            self._probe_task = None
+
+    async def _recover(self, probe: Callable[[], Awaitable[bool]], cooldown: float):
+        while True:
+            await asyncio.sleep(cooldown)
+            self._set_state(HALF_OPEN)
+            try:
+                healthy = await probe()
+            except Exception as e:
+                logger.debug(f"Probe of {self.host} failed: {e}")
+                healthy = False
+            if healthy:
+                self._probe_task = None
+                self.record_success()
+                return
+            self._set_state(OPEN)
+            cooldown = min(cooldown * 2, self.max_reset_timeout)
+
+
+class Upstream:
+    """Rate limiter and circuit breaker shared by everyone calling one host."""
+
+    # Default budget per host: sustained requests per second and burst size
+    rate = 5
+    burst = 10
+
+    def __init__(self, host: str):
+        self.host = host
+        self.limiter = TokenBucket(self.rate, self.burst)
+        self.breaker = CircuitBreaker(host)
+
+
+_upstreams: dict[str, Upstream] = {}
+
+
+def get_upstream(host: str) -> Upstream:
+    upstream = _upstreams.get(host)
+    if upstream is None:
+        upstream = _upstreams[host] = Upstream(host)
+    return upstream
+
+
+async def close_upstreams():
+    """Stop every host's recovery probes, before the transports they use close."""
+    await asyncio.gather(*(upstream.breaker.close() for upstream in _upstreams.values()))
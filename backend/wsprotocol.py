@@ -0,0 +1,64 @@
+from sanic.exceptions import SanicException
+from sanic.log import websockets_logger
+from sanic.server.protocols.websocket_protocol import OPEN, WebSocketProtocol
+from sanic.server.websockets.impl import WebsocketImplProtocol
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+from websockets.server import ServerProtocol
+
+
+class DeflateWebSocketProtocol(WebSocketProtocol):
+    """Sanic's websocket protocol, offering permessage-deflate when enabled.
+
+    Sanic never offers the extension. With ``WS_DEFLATE`` set, clients that
+    ask for it get it, tuned by ``WS_DEFLATE_LEVEL``,
+    ``WS_DEFLATE_WINDOW_BITS`` and ``WS_DEFLATE_CONTEXT_TAKEOVER``.
+    Compression runs per connection, so it trades CPU (and, with context
+    takeover, a compressor's window of memory per client) for egress.
+    """
+
+    def deflate(self) -> ServerPerMessageDeflateFactory | None:
+        config = self.app.config
+        if not config.WS_DEFLATE:
+            return None
+        takeover = bool(config.WS_DEFLATE_CONTEXT_TAKEOVER)
+        return ServerPerMessageDeflateFactory(
+            server_no_context_takeover=not takeover,
+            server_max_window_bits=int(config.WS_DEFLATE_WINDOW_BITS),
+            # memLevel 5 is what websockets uses by default
+            compress_settings={"memLevel": 5, "level": int(config.WS_DEFLATE_LEVEL)}
+        )
+
+    async def websocket_handshake(self, request, subprotocols=None):
+        # Sanic's handshake, with the extension on the ServerProtocol
+        deflate = self.deflate()
+        if deflate is None:
+            return await super().websocket_handshake(request, subprotocols)
+        try:
+            ws_proto = ServerProtocol(
+                extensions=[deflate],
+                subprotocols=list(subprotocols) if subprotocols is not None else None,
+                max_size=self.websocket_max_size,
+                state=OPEN,
+                logger=websockets_logger,
+            )
+            resp = ws_proto.accept(self.sanic_request_to_ws_request(request))
+        except Exception:
+            raise SanicException("Failed to open a WebSocket connection.", status_code=500)
+        if not 100 <= resp.status_code <= 299:
+            raise SanicException(resp.body, resp.status_code)
+
+        head = f"HTTP/1.1 {resp.status_code} {resp.reason_phrase}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in resp.headers.items())
+        await self.send(head.encode() + b"\r\n")
+
+        self.websocket = WebsocketImplProtocol(
+            ws_proto,
+            ping_interval=self.websocket_ping_interval,
+            ping_timeout=self.websocket_ping_timeout,
+            close_timeout=self.websocket_timeout,
+        )
+        await self.websocket.connection_made(self, loop=getattr(request.transport, "loop", None))
+        self.websocket_url = request.url
+        self.websocket_peer = f"{request.client_ip}:{request.port}"
+        self.log_websocket("OPEN")
+        return self.websocket